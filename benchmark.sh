@@ -0,0 +1,8 @@
+#!/bin/sh
+
+set -e
+
+# MUSICBOT_BENCHMARK_FILES sets the synthetic library size, compare with a previous run using --benchmark-compare=<version>
+version=$(grep -m1 '^version' pyproject.toml | cut -d '"' -f2)
+
+MUSICBOT_SERVICE_TIMEOUT="${MUSICBOT_SERVICE_TIMEOUT:-5}" uv run pytest benchmarks --no-cov --benchmark-storage=benchmarks/results --benchmark-save="$version" "$@"
@@ -0,0 +1,79 @@
+import asyncio
+import os
+from collections.abc import Generator
+from pathlib import Path
+
+from beartype import beartype
+from pytest import TempPathFactory, fixture
+
+from musicbot import Folder, Music, MusicDb, Playlist, ScanFolders
+
+from .library import GENRES, KEYWORDS, TRACKS_PER_ALBUM, generate_library
+
+DEFAULT_BENCHMARK_FILES = 2000
+DEFAULT_BENCHMARK_PLAYLIST = 100_000
+
+
+@fixture(scope="session")
+@beartype
+def library(tmp_path_factory: TempPathFactory) -> Path:
+    """Synthetic library, its size is read from MUSICBOT_BENCHMARK_FILES"""
+    root = tmp_path_factory.mktemp("library")
+    count = int(os.environ.get("MUSICBOT_BENCHMARK_FILES", DEFAULT_BENCHMARK_FILES))
+    _ = generate_library(root, count)
+    return root
+
+
+@fixture(scope="session")
+@beartype
+def scan_folders(library: Path) -> ScanFolders:
+    """Already parsed library, shared by the benchmarks which do not measure the scan itself"""
+    scan_folders = ScanFolders([library])
+    _ = scan_folders.snapshots
+    _ = scan_folders.files
+    return scan_folders
+
+
+@fixture(scope="session")
+@beartype
+def big_playlist() -> Playlist:
+    """In-memory playlist without files nor database, its size is read from MUSICBOT_BENCHMARK_PLAYLIST"""
+    count = int(os.environ.get("MUSICBOT_BENCHMARK_PLAYLIST", DEFAULT_BENCHMARK_PLAYLIST))
+    musics = []
+    for index in range(count):
+        artist = f"Artist {index // (TRACKS_PER_ALBUM * 4)}"
+        album = f"Album {index // TRACKS_PER_ALBUM}"
+        track = index % TRACKS_PER_ALBUM + 1
+        title = f"{str(track).zfill(2)} - Title {index}"
+        musics.append(
+            Music(
+                title=title,
+                album=album,
+                artist=artist,
+                genre=GENRES[index % len(GENRES)],
+                size=4_000_000 + index,
+                rating=float(index % 11) / 2,
+                length=180 + index % 120,
+                keywords=frozenset(KEYWORDS[index % len(KEYWORDS) : index % len(KEYWORDS) + 2]),
+                folders=frozenset([Folder(name="/music", ipv4="127.0.0.1", username="benchmark", path=Path("/music") / artist / album / f"{title}.flac")]),
+                track=track,
+            )
+        )
+    return Playlist(name="benchmark", musics=musics)
+
+
+@fixture(scope="session")
+def runner() -> Generator[asyncio.Runner, None, None]:
+    """One event loop for the whole session, so the Gel client connections are reused between rounds"""
+    with asyncio.Runner() as runner:
+        yield runner
+
+
+@fixture(scope="session")
+@beartype
+def musicdb(dsn: str, runner: asyncio.Runner, scan_folders: ScanFolders) -> MusicDb:
+    """Database filled with the synthetic library"""
+    musicdb = MusicDb.from_dsn(dsn)
+    runner.run(musicdb.clean_musics())
+    _ = runner.run(scan_folders.scan(musicdb=musicdb))
+    return musicdb
@@ -0,0 +1,56 @@
+import logging
+import random
+from pathlib import Path
+
+from beartype import beartype
+
+from musicbot.defaults import STORED_RATING_CHOICES
+from tests.synthetic import write_flac, write_mp3
+
+logger = logging.getLogger(__name__)
+
+GENRES = ["Rock", "Metal", "Avantgarde", "Electro", "Jazz", "Classical", "Rap", "Reggae", "Pop", "Folk"]
+KEYWORDS = ["cutoff", "experimental", "heavy", "intro", "live", "rock", "slow", "talkover", "instrumental", "cover", "remix", "acoustic"]
+WORDS = ["Doom", "Ride", "Welcome", "Land", "Peace", "Giant", "Robot", "Night", "Fire", "Ghost", "River", "Machine", "Dust", "Star"]
+TRACKS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 4
+
+
+@beartype
+def name(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+@beartype
+def generate_library(root: Path, count: int, seed: int = 0) -> list[Path]:
+    """Write count tagged musics under root/artist/album, half mp3 and half flac, deterministic for a given seed"""
+    rng = random.Random(seed)
+    paths: list[Path] = []
+    artist = album = ""
+    album_folder = root
+    for index in range(count):
+        if index % (TRACKS_PER_ALBUM * ALBUMS_PER_ARTIST) == 0:
+            artist = f"{name(rng, 2)} {index}"
+        if index % TRACKS_PER_ALBUM == 0:
+            album = f"{name(rng, 3)} {index}"
+            album_folder = root / artist / album
+            album_folder.mkdir(parents=True, exist_ok=True)
+        track = index % TRACKS_PER_ALBUM + 1
+        title = f"{str(track).zfill(2)} - {name(rng, rng.randint(1, 4))}"
+        extension = ".flac" if index % 2 else ".mp3"
+        path = album_folder / f"{title}{extension}"
+        writer = write_flac if extension == ".flac" else write_mp3
+        writer(
+            path=path,
+            artist=artist,
+            album=album,
+            title=title,
+            track=track,
+            genre=rng.choice(GENRES),
+            rating=rng.choice(STORED_RATING_CHOICES),
+            keywords=rng.sample(KEYWORDS, rng.randint(0, 4)),
+            cover=track == 1,
+        )
+        paths.append(path)
+    logger.info(f"{root} : generated {count} musics")
+    return paths
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+import re
+from pathlib import Path
+
+from beartype import beartype
+from beartype.typing import Any
+from pytest import mark
+from pytest_benchmark.fixture import BenchmarkFixture
+
+import musicbot
+from musicbot import Music, MusicDb, MusicInput, ScanFolders
+from musicbot.defaults import DEFAULT_UPSERT_CHUNK
+from musicbot.filter_compiler import escape_like
+
+logger = logging.getLogger(__name__)
+
+QUERIES = Path(musicbot.__file__).parent / "queries"
+INDEX_SCAN = re.compile(r"index[\s_]*(only[\s_]*)?scan", re.IGNORECASE)
+
+
+@beartype
+def test_upsert_music(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb, scan_folders: ScanFolders) -> None:
+    music_inputs = [music_input for snapshot in scan_folders.snapshots if (music_input := snapshot.music_input) is not None]
+
+    async def upsert_all() -> list[Music | None]:
+        semaphore = asyncio.Semaphore(musicdb.coroutines)
+
+        async def upsert(music_input: MusicInput) -> Music | None:
+            async with semaphore:
+                return await musicdb.upsert_music(music_input)
+
+        return await asyncio.gather(*[upsert(music_input) for music_input in music_inputs])
+
+    musics = benchmark.pedantic(lambda: runner.run(upsert_all()), rounds=3)
+    benchmark.extra_info["musics"] = len(musics)
+    assert all(musics)
+
+
+@beartype
+def test_upsert_musics(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb, scan_folders: ScanFolders) -> None:
+    music_inputs = [music_input for snapshot in scan_folders.snapshots if (music_input := snapshot.music_input) is not None]
+
+    async def upsert_all() -> list[Music]:
+        musics = []
+        for start in range(0, len(music_inputs), DEFAULT_UPSERT_CHUNK):
+            musics.extend(await musicdb.upsert_musics(music_inputs[start : start + DEFAULT_UPSERT_CHUNK]))
+        return musics
+
+    musics = benchmark.pedantic(lambda: runner.run(upsert_all()), rounds=3)
+    benchmark.extra_info["musics"] = len(musics)
+    assert len(musics) == len(music_inputs)
+
+
+@beartype
+def test_make_playlist(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb) -> None:
+    playlist = benchmark(lambda: runner.run(musicdb.make_playlist()))
+    benchmark.extra_info["musics"] = len(playlist.musics)
+    assert playlist.musics
+
+
+@beartype
+def test_make_bests(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb) -> None:
+    bests = benchmark(lambda: runner.run(musicdb.make_bests()))
+    benchmark.extra_info["playlists"] = len(bests)
+    assert bests
+
+
+@beartype
+def test_remove_music_path(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb, library: Path) -> None:
+    """Path lookup cost, run with MUSICBOT_BENCHMARK_FILES=200000 to check it does not grow with the library"""
+    missing = str(library / "missing.flac")
+    removed = benchmark(lambda: runner.run(musicdb.remove_music_path(missing)))
+    assert not removed
+
+
+@beartype
+def test_remove_music_paths(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb, library: Path) -> None:
+    """Batched path lookup cost, it must not grow with the library either"""
+    missing = [str(library / f"missing_{index}.flac") for index in range(100)]
+    removed = benchmark(lambda: runner.run(musicdb.remove_music_paths(missing)))
+    assert not removed
+
+
+@beartype
+def test_remove_folder(benchmark: BenchmarkFixture, runner: asyncio.Runner, musicdb: MusicDb, library: Path) -> None:
+    """Prefix lookup cost of a vanished directory"""
+    removed = benchmark(lambda: runner.run(musicdb.remove_folder(str(library / "missing"))))
+    assert not removed
+
+
+@beartype
+@mark.parametrize(
+    "name, arguments",
+    [
+        ("remove", lambda library: {"path": str(library / "missing.flac")}),
+        ("remove_musics_paths", lambda library: {"paths": [str(library / "missing.flac"), str(library / "missing.mp3")]}),
+        ("remove_folder_prefix", lambda library: {"prefix": escape_like(str(library / "missing") + os.sep)}),
+    ],
+)
+def test_path_index_plan(runner: asyncio.Runner, musicdb: MusicDb, library: Path, name: str, arguments: Any) -> None:
+    """Removals must look paths up through the index on (__subject__@path) of Music.folders, analyze runs the statement so only missing paths are given"""
+    query = (QUERIES / f"{name}.edgeql").read_text()
+    plan = str(runner.run(musicdb.client.query_single(f"analyze {query}", **arguments(library))))
+    assert INDEX_SCAN.search(plan), f"{name} does not use the path index :\n{plan}"
@@ -0,0 +1,47 @@
+import logging
+from pathlib import Path
+
+import click
+from beartype import beartype
+from pytest import mark
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from musicbot import Playlist, PlaylistOptions, ScanFolders
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+def test_m3u(benchmark: BenchmarkFixture, scan_folders: ScanFolders, tmp_path: Path) -> None:
+    playlist = Playlist(name="benchmark", musics=scan_folders.musics)
+    m3u = tmp_path / "benchmark.m3u"
+
+    def write() -> None:
+        with click.open_file(str(m3u), "w", lazy=True) as file:
+            playlist.print(output="m3u", file=file)
+
+    benchmark(write)
+    benchmark.extra_info["musics"] = len(playlist.musics)
+    assert m3u.read_text().startswith("#EXTM3U")
+
+
+@mark.parametrize("output", ["m3u", "m3u8", "ndjson"])
+@beartype
+def test_writers(benchmark: BenchmarkFixture, big_playlist: Playlist, tmp_path: Path, output: str) -> None:
+    path = tmp_path / f"benchmark.{output}"
+
+    def write() -> None:
+        with click.open_file(str(path), "w", lazy=True) as file:
+            big_playlist.print(output=output, file=file)
+
+    benchmark.pedantic(write, rounds=3)
+    benchmark.extra_info["musics"] = len(big_playlist.musics)
+    assert path.stat().st_size
+
+
+@beartype
+def test_table(benchmark: BenchmarkFixture, big_playlist: Playlist) -> None:
+    """Rich table construction, which every output used to pay before the streaming writers"""
+    table = benchmark.pedantic(Playlist.table, args=(big_playlist.musics, PlaylistOptions()), rounds=3)
+    benchmark.extra_info["musics"] = len(big_playlist.musics)
+    assert table.row_count == len(big_playlist.musics)
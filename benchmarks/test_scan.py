@@ -0,0 +1,30 @@
+import logging
+from pathlib import Path
+
+from beartype import beartype
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from musicbot import ScanFolders
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+def test_walk(benchmark: BenchmarkFixture, library: Path) -> None:
+    folders_and_paths = benchmark(lambda: ScanFolders([library]).folders_and_paths)
+    benchmark.extra_info["musics"] = len(folders_and_paths)
+    assert folders_and_paths
+
+
+@beartype
+def test_files(benchmark: BenchmarkFixture, library: Path) -> None:
+    files = benchmark.pedantic(lambda: ScanFolders([library]).files, rounds=3)
+    benchmark.extra_info["musics"] = len(files)
+    assert files
+
+
+@beartype
+def test_issues(benchmark: BenchmarkFixture, scan_folders: ScanFolders) -> None:
+    issues = benchmark(lambda: [file.issues for file in scan_folders.files])
+    benchmark.extra_info["musics"] = len(issues)
+    assert not any(issues)
@@ -2,6 +2,6 @@
 
 set -e
 
-uv run isort musicbot tests
-uv run black musicbot tests
+uv run isort musicbot tests benchmarks
+uv run black musicbot tests benchmarks
 
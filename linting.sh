@@ -5,16 +5,16 @@ set -e
 sh code-format.sh
 
 echo "linting : ruff..."
-uv run ruff check musicbot tests
+uv run ruff check musicbot tests benchmarks
 
 echo "linting : pylint..."
-uv run pylint musicbot tests
+uv run pylint musicbot tests benchmarks
 
 echo "linting : flake8..."
-uv run flake8 musicbot tests
+uv run flake8 musicbot tests benchmarks
 
 echo "static type checking : mypy..."
-uv run mypy musicbot tests
+uv run mypy musicbot tests benchmarks
 
 # echo "static type checking : pyright..."
 # uv run pyright
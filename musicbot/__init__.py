@@ -1,5 +1,5 @@
 from musicbot.config import Config
-from musicbot.file import File, Issue
+from musicbot.file import File
 from musicbot.folder import Folder
 from musicbot.helpers import syncify
 from musicbot.music import Music, MusicInput
@@ -9,7 +9,10 @@ from musicbot.object import MusicbotObject
 from musicbot.playlist import Playlist
 from musicbot.playlist_options import PlaylistOptions
 from musicbot.scan_folders import ScanFolders
+from musicbot.scan_stats import ScanStats
 from musicbot.spotify import Spotify
+from musicbot.tag_cache import TagCache
+from musicbot.tag_snapshot import Issue, TagSnapshot
 
 __all__ = [
     "MusicbotObject",
@@ -24,6 +27,9 @@ __all__ = [
     "MusicDb",
     "Folder",
     "ScanFolders",
+    "ScanStats",
     "Spotify",
+    "TagCache",
+    "TagSnapshot",
     "syncify",
 ]
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import gel
+from beartype import beartype
+from beartype.typing import AsyncIterator
+
+from musicbot.defaults import (
+    DEFAULT_COROUTINES,
+    DEFAULT_LATENCY_TOLERANCE,
+    DEFAULT_TARGET_LATENCY,
+)
+from musicbot.object import MusicbotObject
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_ERRORS = (
+    gel.errors.TransactionConflictError,
+    gel.errors.ClientConnectionTimeoutError,
+    gel.errors.QueryTimeoutError,
+    gel.errors.TransactionTimeoutError,
+    TimeoutError,
+)
+
+
+@beartype
+@dataclass
+class AdaptiveLimiter(MusicbotObject):
+    """AIMD concurrency limit: grows by one after a window of healthy calls, halves on conflicts, timeouts or slow calls
+
+    A call is slow when it exceeds both the target latency and a few times the fastest call of the same kind seen so far.
+    """
+
+    max_limit: int = DEFAULT_COROUTINES
+    min_limit: int = 1
+    target_latency: float = DEFAULT_TARGET_LATENCY
+    limit: int = 0
+    in_use: int = 0
+    healthy: int = 0
+    decreases: int = 0
+    last_decrease: float = 0.0
+    baselines: dict[str, float] = field(default_factory=dict)
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+    def __post_init__(self) -> None:
+        self.max_limit = max(self.max_limit, self.min_limit)
+        if not self.limit:
+            self.limit = max(self.max_limit // 4, self.min_limit)
+
+    def increase(self) -> None:
+        self.healthy += 1
+        if self.healthy >= self.limit:
+            self.healthy = 0
+            self.limit = min(self.limit + 1, self.max_limit)
+
+    def decrease(self) -> None:
+        now = time.perf_counter()
+        # calls started before the previous decrease should not halve the limit again
+        if now - self.last_decrease < self.target_latency:
+            return
+        self.last_decrease = now
+        self.healthy = 0
+        self.decreases += 1
+        self.limit = max(self.limit // 2, self.min_limit)
+        logger.info(f"{self} : concurrency decreased to {self.limit}")
+
+    def slow(self, kind: str, latency: float) -> bool:
+        baseline = self.baselines[kind] = min(self.baselines.get(kind, latency), latency)
+        return latency > max(self.target_latency, baseline * DEFAULT_LATENCY_TOLERANCE)
+
+    @asynccontextmanager
+    async def slot(self, kind: str = "query") -> AsyncIterator[None]:
+        async with self.condition:
+            _ = await self.condition.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except OVERLOAD_ERRORS:
+            self.decrease()
+            raise
+        else:
+            if self.slow(kind, time.perf_counter() - start):
+                self.decrease()
+            else:
+                self.increase()
+        finally:
+            async with self.condition:
+                self.in_use -= 1
+                self.condition.notify_all()
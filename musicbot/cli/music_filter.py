@@ -56,7 +56,11 @@ def sane_music_filters(ctx: click.Context, param: click.Parameter, value: Any) -
                 MusicbotObject.err(f"Error : unknown property {property_key} for value {property_value}")
                 raise click.Abort()
 
-            mf = replace(mf, **{field.name: field.type(property_value)})  # type: ignore
+            if field.type == frozenset[str]:
+                # keywords never contain spaces, they are space separated in tags
+                mf = replace(mf, **{field.name: frozenset(split_val[1].split())})  # type: ignore
+            else:
+                mf = replace(mf, **{field.name: field.type(property_value)})  # type: ignore
 
         and_filters.append(mf)
 
@@ -212,6 +212,12 @@ threads_option = click.option(
     show_default=True,
 )
 
+stats_option = click.option(
+    "--stats",
+    help="Print per-stage timers and counters to stderr at the end",
+    is_flag=True,
+)
+
 save_option = click.option(
     "--save",
     "-s",
@@ -229,6 +235,14 @@ output_option = click.option(
     type=click.Choice(["json", "table", "m3u"]),
 )
 
+playlist_output_option = click.option(
+    "--output",
+    help="Output format",
+    default=DEFAULT_OUTPUT,
+    show_default=True,
+    type=click.Choice(["json", "table", "m3u", "m3u8", "ndjson"]),
+)
+
 
 @beartype
 def config_string(ctx: click.Context, param: click.Parameter, value: str | None) -> Any:
@@ -7,7 +7,13 @@ from click_option_group import optgroup
 from click_skeleton import add_options
 
 from musicbot.cli.options import config_list, dry_option, sane_frozenset
-from musicbot.defaults import DEFAULT_EXTENSIONS
+from musicbot.defaults import (
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_EXECUTOR,
+    DEFAULT_EXTENSIONS,
+    DEFAULT_TAG_CACHE_PATH,
+    EXECUTORS,
+)
 from musicbot.scan_folders import ScanFolders
 
 logger = logging.getLogger(__name__)
@@ -21,11 +27,17 @@ def sane_scan_folders(ctx: click.Context, param: click.Parameter, value: tuple[s
     value = config_list(ctx, param, value)
     limit = ctx.params.pop("limit", None)
     extensions = ctx.params.pop("extensions", DEFAULT_EXTENSIONS)
+    tag_cache = ctx.params.pop("tag_cache", None)
+    executor = ctx.params.pop("executor", DEFAULT_EXECUTOR)
+    chunksize = ctx.params.pop("chunksize", DEFAULT_CHUNKSIZE)
     paths = [Path(path).expanduser() for path in value]
     folders = ScanFolders(
         directories=paths,
         limit=limit,
         extensions=extensions,
+        tag_cache_path=Path(tag_cache).expanduser() if tag_cache else None,
+        executor=executor,
+        chunksize=chunksize,
     )
     ctx.params[param.name] = folders
     return folders
@@ -59,6 +71,29 @@ scan_folders_argument = add_options(
         show_default=True,
         is_eager=True,
     ),
+    optgroup.option(
+        "--tag-cache",
+        help="Tags cache file, skip parsing of unchanged files (empty to disable)",
+        default=DEFAULT_TAG_CACHE_PATH,
+        show_default=True,
+        is_eager=True,
+    ),
+    optgroup.option(
+        "--executor",
+        help="Parse tags with threads, or with processes to use all cores",
+        type=click.Choice(EXECUTORS),
+        default=DEFAULT_EXECUTOR,
+        show_default=True,
+        is_eager=True,
+    ),
+    optgroup.option(
+        "--chunksize",
+        help="Number of files sent at once to each process",
+        type=click.IntRange(min=1),
+        default=DEFAULT_CHUNKSIZE,
+        show_default=True,
+        is_eager=True,
+    ),
     click.argument(
         "scan_folders",
         nargs=-1,
@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import os
+import sys
 from dataclasses import asdict
 from pathlib import Path
 
@@ -29,7 +31,9 @@ from musicbot.cli.options import (
     dry_option,
     lazy_yes_option,
     output_option,
+    playlist_output_option,
     save_option,
+    stats_option,
     yes_option,
 )
 from musicbot.cli.playlist import bests_options, playlist_options
@@ -38,6 +42,7 @@ from musicbot.cli.scan_folders import (
     scan_folder_argument,
     scan_folders_argument,
 )
+from musicbot.music_filter import NO_KEYWORDS
 
 logger = logging.getLogger(__name__)
 
@@ -88,7 +93,7 @@ async def folders(musicdb: MusicDb, output: str) -> None:
         MusicbotObject.print_json([asdict(folder) for folder in all_folders])
 
 
-@cli.command(help="Remove one or more music", aliases=["delete"])
+@cli.command(help="Remove one or more music or directories", aliases=["delete"])
 @click.argument("files", nargs=-1)
 @musicdb_options
 @syncify
@@ -97,8 +102,13 @@ async def remove(
     files: tuple[str, ...],
     musicdb: MusicDb,
 ) -> None:
-    for file in files:
-        _ = await musicdb.remove_music_path(file)
+    # deleted directories no longer exist, a trailing separator marks them
+    directories = [file for file in files if file.endswith(os.sep) or Path(file).is_dir()]
+    for directory in directories:
+        _ = await musicdb.remove_folder(directory)
+    _ = await musicdb.remove_music_paths([file for file in files if file not in directories])
+    # musics left without any folder are deleted, stored stats are refreshed afterwards
+    await musicdb.soft_clean()
 
 
 @cli.command(help="Clean all musics", aliases=["wipe"])
@@ -112,6 +122,16 @@ async def clean(
     await musicdb.clean_musics()
 
 
+@cli.command(help="Recompute stored stats of folders, artists, albums, genres and keywords")
+@musicdb_options
+@syncify
+@beartype
+async def refresh_stats(
+    musicdb: MusicDb,
+) -> None:
+    await musicdb.refresh_stats()
+
+
 @cli.command(help="Load musics")
 @scan_folders_argument
 @musicdb_options
@@ -119,6 +139,8 @@ async def clean(
 @output_option
 @clean_option
 @coroutines_option
+@stats_option
+@click.option("--incremental", help="Only upsert new or modified files, and remove vanished ones", is_flag=True)
 @syncify
 @beartype
 async def scan(
@@ -127,17 +149,22 @@ async def scan(
     clean: bool,
     save: bool,
     output: str,
+    stats: bool,
+    incremental: bool,
 ) -> None:
     if clean:
         await musicdb.clean_musics()
 
-    music_outputs = await scan_folders.scan(musicdb=musicdb)
+    music_outputs = await scan_folders.scan(musicdb=musicdb, incremental=incremental and not clean, collect=output == "json")
 
     await musicdb.soft_clean()
 
     if output == "json":
         MusicbotObject.print_json([asdict(mo) for mo in music_outputs])
 
+    if stats:
+        musicdb.stats.print(output="json" if output == "json" else "table", file=sys.stderr)
+
     if save:
         MusicbotObject.config.configfile["musicbot"]["folders"] = scan_folders.unique_directories
         MusicbotObject.config.write()
@@ -148,6 +175,7 @@ async def scan(
 @musicdb_options
 @click.option("--sleep", help="Clean music every X seconds", type=int, default=1800, show_default=True)
 @click.option("--timeout", help="How many seconds until we terminate", type=int, show_default=True)
+@stats_option
 @syncify
 @beartype
 async def watch(
@@ -155,6 +183,7 @@ async def watch(
     scan_folders: ScanFolders,
     sleep: int,
     timeout: int | None,
+    stats: bool,
 ) -> None:
     async def soft_clean_periodically() -> None:
         try:
@@ -171,13 +200,19 @@ async def watch(
     async def update_music(path: Path) -> None:
         for directory in scan_folders.directories:
             if str(path).startswith(str(directory)):
-                if (file := File.from_path(folder=directory, path=path)) is None:
+                musicdb.stats.count("files")
+                with musicdb.stats.timer("parse"):
+                    file = File.from_path(folder=directory, path=path)
+                if file is None:
                     continue
 
-                if (music_input := file.music_input) is None:
+                with musicdb.stats.timer("music_input"):
+                    music_input = file.music_input
+                if music_input is None:
                     continue
 
-                _ = await musicdb.upsert_music(music_input)
+                with musicdb.stats.timer("upsert"):
+                    _ = await musicdb.upsert_music(music_input)
 
     async def watcher() -> None:
         class MusicWatchFilter(DefaultFilter):
@@ -191,17 +226,25 @@ async def watch(
                 debug=MusicbotObject.config.debug,
             ):
                 try:
+                    deleted_paths = []
                     for change_path in changes:
                         change, path = change_path
                         if change in (Change.added, Change.modified):
                             await update_music(Path(path))
                         elif change == Change.deleted:
-                            _ = await musicdb.remove_music_path(path)
+                            deleted_paths.append(path)
+                    # a moved or deleted album arrives as one batch of changes, stored stats are refreshed once per batch
+                    if deleted_paths:
+                        _ = await musicdb.remove_music_paths(deleted_paths)
+                        await musicdb.soft_clean()
+                    else:
+                        await musicdb.refresh_stats()
                 except gel.ClientConnectionFailedTemporarilyError as error:
                     MusicbotObject.err(f"{musicdb} : unable to clean musics", error=error)
         except (asyncio.CancelledError, KeyboardInterrupt):
             pass
 
+    await musicdb.warm_upsert_cache()
     try:
         future = asyncio.gather(
             soft_clean_periodically(),
@@ -211,10 +254,13 @@ async def watch(
     except (TimeoutError, asyncio.CancelledError, KeyboardInterrupt):
         pass
 
+    if stats:
+        musicdb.stats.print(output="table", file=sys.stderr)
+
 
 @cli.command(short_help="Generate a new playlist", help=FILTERS_REPRS)
 @musicdb_options
-@output_option
+@playlist_output_option
 @music_filters_options
 @playlist_options
 @click.argument("out", type=click.File("w", lazy=True), default="-")
@@ -295,7 +341,7 @@ async def bests(
     playlist_options: PlaylistOptions,
 ) -> None:
     musicdb.set_readonly()
-    await local.bests(
+    _ = await local.bests(
         musicdb=musicdb,
         music_filters=music_filters,
         path=scan_folder,
@@ -353,63 +399,27 @@ async def custom_playlists(
     scan_folders = ScanFolders(directories=[scan_folder])
     if not fast:
         await musicdb.clean_musics()
-        _ = await scan_folders.scan(musicdb=musicdb)
+        _ = await scan_folders.scan(musicdb=musicdb, collect=False)
 
     musicdb.set_readonly()
 
-    MusicbotObject.success(f"{scan_folders} : flushing old m3u")
-    scan_folders.flush_m3u()
-
     bests_music_filter = MusicFilter(
         min_rating=4.0,
-        keyword="^((?!cutoff|bad|demo|intro).)",
+        keywords_none=NO_KEYWORDS,
     )
-    await local.bests(
+    playlists = await local.bests(
         musicdb=musicdb,
         music_filters=[bests_music_filter],
         path=scan_folder,
         min_playlist_size=min_playlist_size,
         playlist_options=playlist_options,
     )
+    MusicbotObject.success(f"{scan_folders} : flushing stale m3u")
+    scan_folders.flush_m3u(keep=frozenset(playlists), patterns=local.BESTS_PLAYLISTS)
 
-    pike_keywords = await musicdb.pike_keywords()
-
-    for pike_keyword in pike_keywords:
-        MusicbotObject.success(f"Generating pike playlists for keyword {pike_keyword}")
-        for rating in [4.0, 4.5, 5.0]:
-            MusicbotObject.success(f"Generating playlist for {pike_keyword}_{rating}")
-            pike_music_filter = MusicFilter(
-                artist="Buckethead",
-                min_rating=rating,
-                keyword=rf"^(?=.*pike)(?=.*{pike_keyword}).*$",
-            )
-            out = click.utils.LazyFile(
-                filename=f"{scan_folder}/Buckethead/Pikes/{pike_keyword}_{rating}.m3u",
-                mode="w",
-            )
-            await local.playlist(
-                musicdb=musicdb,
-                output="m3u",
-                music_filters=[pike_music_filter],
-                playlist_options=playlist_options,
-                out=out,
-            )
-
-    for rating in [4.0, 4.5, 5.0]:
-        MusicbotObject.success(f"Generating playlist rating for Pikes {rating}")
-        rating_music_filter = MusicFilter(
-            artist="Buckethead",
-            min_rating=rating,
-            keyword="pike",
-        )
-        out = click.utils.LazyFile(
-            filename=f"{scan_folder}/Buckethead/Pikes/rating_{rating}.m3u",
-            mode="w",
-        )
-        await local.playlist(
-            musicdb=musicdb,
-            output="m3u",
-            music_filters=[rating_music_filter],
-            playlist_options=playlist_options,
-            out=out,
-        )
+    pikes = await local.pikes(
+        musicdb=musicdb,
+        path=scan_folder,
+        playlist_options=playlist_options,
+    )
+    scan_folders.flush_m3u(keep=frozenset(pikes), patterns=local.PIKES_PLAYLISTS)
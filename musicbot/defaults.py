@@ -32,7 +32,17 @@ DEFAULT_SPOTIFY_DOWNLOAD_PLAYLIST: str = "To Download"
 
 DEFAULT_ACOUSTID_API_KEY: str | None = None
 DEFAULT_THREADS: int = 8
+DEFAULT_EXECUTOR: str = "thread"
+EXECUTORS: list[str] = ["thread", "process"]
+DEFAULT_CHUNKSIZE: int = 16
 DEFAULT_COROUTINES: int = 64
+DEFAULT_UPSERT_CHUNK: int = 500
+DEFAULT_PAGE_SIZE: int = 1000
+DEFAULT_PLAYLIST_THREADS: int = 4
+DEFAULT_RETRIES: int = 5
+DEFAULT_BACKOFF: float = 0.05
+DEFAULT_TARGET_LATENCY: float = 1.0
+DEFAULT_LATENCY_TOLERANCE: float = 3.0
 DEFAULT_CLEAN: bool = False
 DEFAULT_DRY: bool = False
 DEFAULT_YES: bool = False
@@ -41,6 +51,7 @@ DEFAULT_OUTPUT: str = "table"
 DEFAULT_FLAT: bool = False
 DEFAULT_EXTENSIONS: frozenset[str] = frozenset({"mp3", "flac"})
 EXCEPT_DIRECTORIES: frozenset[str] = frozenset({".Spotlight-V100", ".zfs", "Android", "LOST.DIR"})
+DEFAULT_TAG_CACHE_PATH: str = "~/.musicbot_tags_cache"
 
 STOPWORDS: list[str] = [
     "the",
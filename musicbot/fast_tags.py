@@ -0,0 +1,369 @@
+"""Header-only mp3/flac tags reader, returns None when Mutagen must be used instead"""
+
+import logging
+import mmap
+import struct
+from pathlib import Path
+
+from beartype import beartype
+from mutagen.id3 import Frames
+
+logger = logging.getLogger(__name__)
+
+Tags = dict[str, list[str]]
+
+EMPTY_FRAME = b"\x00" * 10
+ID3_TEXT_FRAMES = frozenset({"TIT2", "TALB", "TPE1", "TCON", "TRCK"})
+ID3_ENCODINGS = {0: "latin1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+MPEG_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+
+class Unsupported(Exception):
+    """Raised when the fast path cannot guarantee Mutagen values"""
+
+
+def syncsafe(value: int) -> int:
+    result = 0
+    shift = 0
+    while value:
+        result += (value & 0x7F) << shift
+        value >>= 8
+        shift += 7
+    return result
+
+
+def determine_syncsafe(data: mmap.mmap, start: int, end: int) -> bool:
+    """Same heuristic as Mutagen, iTunes used to write plain ints as ID3v2.4 frame sizes"""
+
+    def walk(convert: bool) -> tuple[int, int]:
+        offset = start
+        found = 0
+        while offset < end - 10:
+            part = data[offset : offset + 10]
+            if part == EMPTY_FRAME:
+                return found, -((end - offset) % 10)
+            name, size, _ = struct.unpack(">4sLH", part)
+            offset += 10 + (syncsafe(size) if convert else size)
+            try:
+                if name.decode("ascii") in Frames:
+                    found += 1
+            except UnicodeDecodeError:
+                continue
+        return found, offset - end
+
+    asbpi, bpioff = walk(convert=True)
+    asint, intoff = walk(convert=False)
+    return not (asint > asbpi or (asint == asbpi and (bpioff >= 1 and intoff <= 1)))
+
+
+def decode_text(data: bytes, encoding: int, v24: bool) -> tuple[str, bytes]:
+    """Decode one null terminated value, returns it with the remaining data"""
+    codec = ID3_ENCODINGS[encoding]
+    try:
+        if encoding in (0, 3):
+            index = data.find(b"\x00")
+            if index == -1:
+                value, data = data.decode(codec), b""
+            else:
+                value, data = data[:index].decode(codec), data[index + 1 :]
+        else:
+            if encoding == 1 and data[:2] not in (b"\xff\xfe", b"\xfe\xff"):
+                raise Unsupported("utf-16 without BOM")
+            index = data.find(b"\x00\x00", 2 if encoding == 1 else 0)
+            while index != -1 and index % 2:
+                index = data.find(b"\x00\x00", index + 1)
+            if index == -1:
+                if len(data) % 2:
+                    raise Unsupported("unterminated odd utf-16")
+                value, data = data.decode(codec), b""
+            else:
+                value, data = data[:index].decode(codec), data[index + 2 :]
+    except UnicodeDecodeError as error:
+        raise Unsupported(error) from error
+    if not v24 and not data.strip(b"\x00"):
+        data = b""
+    return value, data
+
+
+def decode_texts(data: bytes, encoding: int, v24: bool) -> list[str]:
+    values = []
+    while data:
+        value, data = decode_text(data, encoding, v24)
+        values.append(value)
+    return values
+
+
+def read_id3_frame(name: str, data: bytes, v24: bool) -> tuple[str, list[str]] | None:
+    """Returns the Mutagen hash key and text of a frame, None for junk frames Mutagen drops"""
+    if not data:
+        return None
+    encoding, data = data[0], data[1:]
+    if encoding not in ID3_ENCODINGS:
+        raise Unsupported(f"invalid encoding {encoding}")
+    if not data:
+        return None
+    if name == "COMM":
+        try:
+            lang = data[:3].decode("ascii")
+        except UnicodeDecodeError as error:
+            raise Unsupported(error) from error
+        data = data[3:]
+        if not data:
+            return None
+        desc, data = decode_text(data, encoding, v24)
+        key = f"COMM:{desc}:{lang}"
+    elif name == "TXXX":
+        desc, data = decode_text(data, encoding, v24)
+        key = f"TXXX:{desc}"
+    else:
+        key = name
+    if not data:
+        return None
+    return key, decode_texts(data, encoding, v24)
+
+
+def read_id3(data: mmap.mmap) -> tuple[Tags, int]:
+    """Returns wanted frames and the offset of the audio stream"""
+    if data[:3] != b"ID3":
+        return {}, 0
+    if len(data) < 10:
+        raise Unsupported("truncated ID3 header")
+    major, flags, size = struct.unpack(">xxxBxB4s", data[:10])
+    if major not in (3, 4) or flags & ~0x20 or int.from_bytes(size, "big") & 0x80808080:
+        raise Unsupported(f"ID3v2.{major} with flags {flags:#x}")
+    end = 10 + syncsafe(int.from_bytes(size, "big"))
+    if end > len(data):
+        raise Unsupported("truncated ID3 tag")
+
+    v24 = major == 4
+    convert = v24 and determine_syncsafe(data, 10, end)
+    tags: Tags = {}
+    offset = 10
+    while offset + 10 <= end:
+        raw_name, size, frame_flags = struct.unpack(">4sLH", data[offset : offset + 10])
+        if raw_name.strip(b"\x00") == b"":
+            break
+        if convert:
+            size = syncsafe(size)
+        start = offset + 10
+        offset = start + size
+        if size == 0:
+            continue
+        try:
+            name = raw_name.decode("ascii")
+        except UnicodeDecodeError:
+            continue
+        if name.endswith("\x00"):
+            raise Unsupported(f"ID3v2.2 frame name {name!r}")
+        if name not in ID3_TEXT_FRAMES and name not in ("TXXX", "COMM"):
+            continue
+        if frame_flags & 0xFF:
+            raise Unsupported(f"{name} frame flags {frame_flags:#x}")
+        if (read := read_id3_frame(name, data[start : min(offset, end)], v24)) is None:
+            continue
+        key, values = read
+        merged = tags.setdefault(key, [])
+        for value in values:
+            if value not in merged:
+                merged.append(value)
+
+    for genre in tags.get("TCON", []):
+        if genre.isdecimal() or genre in ("CR", "RX") or genre.startswith("(") or "\n" in genre:
+            raise Unsupported(f"genre reference {genre!r}")
+    if "TCON" in tags:
+        tags["TCON"] = [genre for genre in tags["TCON"] if genre]
+    return tags, end
+
+
+def read_mpeg_length(data: mmap.mmap, offset: int) -> float:
+    """Length from the Xing/Info header of the first MPEG layer III frame"""
+    if data[offset : offset + 3] == b"ID3":
+        raise Unsupported("stacked ID3 tags")
+    if len(data) < offset + 4:
+        raise Unsupported("no MPEG frame")
+    header = int.from_bytes(data[offset : offset + 4], "big")
+    if header >> 21 != 0x7FF:
+        raise Unsupported("no MPEG sync after tags")
+    version_bits = (header >> 19) & 3
+    layer_bits = (header >> 17) & 3
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 3
+    mode = (header >> 6) & 3
+    if version_bits == 1 or layer_bits != 1 or sample_rate_index == 3 or bitrate_index in (0, 0xF):
+        raise Unsupported("not a valid MPEG layer III frame")
+
+    version = {0: 2.5, 2: 2, 3: 1}[version_bits]
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    if version == 1:
+        frame_size = 1152
+        xing_offset = 36 if mode != 3 else 21
+    else:
+        frame_size = 576
+        xing_offset = 21 if mode != 3 else 13
+
+    xing = offset + xing_offset
+    if data[xing : xing + 4] not in (b"Xing", b"Info") or len(data) < xing + 8:
+        raise Unsupported("no Xing header")
+    (xing_flags,) = struct.unpack(">I", data[xing + 4 : xing + 8])
+    if not xing_flags & 0x1:
+        raise Unsupported("no frames count in Xing header")
+    position = xing + 8
+    if len(data) < position + 4:
+        raise Unsupported("truncated Xing header")
+    (frames,) = struct.unpack(">I", data[position : position + 4])
+    position += 4
+    for flag, size in ((0x2, 4), (0x4, 100), (0x8, 4)):
+        if xing_flags & flag:
+            position += size
+    if len(data) < position:
+        raise Unsupported("truncated Xing header")
+
+    samples = frame_size * frames
+    if (delays := read_lame_delays(data[position : position + 20 + 27])) is not None:
+        samples -= sum(delays)
+    return float(max(samples, 0)) / sample_rate
+
+
+def read_lame_delays(data: bytes) -> tuple[int, int] | None:
+    """Encoder delay and padding of the LAME extended header, when Mutagen would parse it"""
+    if len(data) < 20 or not data.startswith((b"LAME", b"L3.99")):
+        return None
+    version = data[:20].lstrip(b"EMAL")
+    major, version = version[0:1], version[1:].lstrip(b".")
+    minor = b""
+    for index in range(len(version)):
+        if not version[index : index + 1].isdigit():
+            break
+        minor += version[index : index + 1]
+    version = version[len(minor) :]
+    try:
+        major_minor = (int(major.decode("ascii")), int(minor.decode("ascii")))
+    except ValueError:
+        return None
+    if major_minor < (3, 90) or (major_minor == (3, 90) and version[-11:-10] == b"("):
+        return None
+    if len(version) < 11:
+        return None
+    payload = data[9 : 9 + 27]
+    if len(payload) != 27 or payload[0] >> 4 != 0:
+        return None
+    delay = (payload[12] << 4) | (payload[13] >> 4)
+    padding = ((payload[13] & 0xF) << 8) | payload[14]
+    return delay, padding
+
+
+@beartype
+def read_mp3(data: mmap.mmap) -> tuple[Tags, float]:
+    tail = data[-131:] if len(data) > 131 else data[:]
+    if b"TAG" in tail:
+        raise Unsupported("ID3v1 tag")
+    tags, offset = read_id3(data)
+    return tags, read_mpeg_length(data, offset)
+
+
+def read_vorbis_comment(data: mmap.mmap, offset: int) -> tuple[Tags, int]:
+    """Parse a vorbis comment block ignoring its declared size, like Mutagen"""
+
+    def uint32(position: int) -> int:
+        if position + 4 > len(data):
+            raise Unsupported("truncated vorbis comment")
+        return struct.unpack("<I", data[position : position + 4])[0]
+
+    offset += 4 + uint32(offset)
+    count = uint32(offset)
+    offset += 4
+    tags: Tags = {}
+    for index in range(count):
+        length = uint32(offset)
+        offset += 4
+        if offset + length > len(data):
+            raise Unsupported("truncated vorbis comment")
+        comment = data[offset : offset + length].decode("utf-8", "replace")
+        offset += length
+        if "=" in comment:
+            key, value = comment.split("=", 1)
+        else:
+            key, value = f"unknown{index}", comment
+        key = key.encode("ascii", "replace").decode("ascii")
+        if key and all(" " <= c <= "}" and c != "=" for c in key):
+            tags.setdefault(key.lower(), []).append(value)
+    return tags, offset
+
+
+def picture_end(data: mmap.mmap, offset: int) -> int:
+    """Real end of a picture block, its declared size is not trusted either"""
+    try:
+        _, length = struct.unpack(">2I", data[offset : offset + 8])
+        offset += 8 + length
+        (length,) = struct.unpack(">I", data[offset : offset + 4])
+        offset += 4 + length + 16
+        (length,) = struct.unpack(">I", data[offset : offset + 4])
+    except struct.error as error:
+        raise Unsupported(error) from error
+    return offset + 4 + length
+
+
+@beartype
+def read_flac(data: mmap.mmap) -> tuple[Tags, float]:
+    if data[:4] != b"fLaC":
+        raise Unsupported("no fLaC marker")
+    offset = 4
+    length: float | None = None
+    tags: Tags | None = None
+    seen: dict[int, int] = {}
+    last = False
+    while not last:
+        if offset + 4 > len(data):
+            raise Unsupported("truncated metadata block")
+        header = data[offset]
+        size = int.from_bytes(data[offset + 1 : offset + 4], "big")
+        code = header & 0x7F
+        last = bool(header & 0x80)
+        offset += 4
+        seen[code] = seen.get(code, 0) + 1
+        if code == 0:
+            if size < 34 or offset + size > len(data):
+                raise Unsupported("invalid stream info")
+            if length is None:
+                sample_first = int.from_bytes(data[offset + 10 : offset + 12], "big")
+                sample_channels_bps = data[offset + 12]
+                bps_total = int.from_bytes(data[offset + 13 : offset + 18], "big")
+                sample_rate = (sample_first << 4) + (sample_channels_bps >> 4)
+                if not sample_rate:
+                    raise Unsupported("invalid sample rate")
+                length = (bps_total & 0xFFFFFFFFF) / float(sample_rate)
+            offset += size
+        elif code == 4:
+            block_tags, offset = read_vorbis_comment(data, offset)
+            if tags is None:
+                tags = block_tags
+        elif code == 6:
+            offset = picture_end(data, offset)
+        elif code in (3, 5) and seen[code] > 1:
+            raise Unsupported("duplicated seektable or cuesheet")
+        else:
+            offset += size
+    if length is None:
+        raise Unsupported("no stream info")
+    return tags or {}, length
+
+
+@beartype
+def read_tags(path: Path) -> tuple[Tags, float] | None:
+    """Tags (keyed like Mutagen, lowercased for flac) and length of a file, None when Mutagen must be used"""
+    if path.suffix == ".mp3":
+        reader = read_mp3
+    elif path.suffix == ".flac":
+        reader = read_flac
+    else:
+        return None
+    try:
+        with path.open("rb") as fd, mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return reader(data)
+    except (Unsupported, ValueError, struct.error) as error:
+        logger.debug(f"{path} : fast tags reader unsupported : {error}")
+    return None
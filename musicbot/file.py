@@ -1,8 +1,7 @@
 import logging
 import shutil
 import warnings
-from dataclasses import asdict, dataclass
-from enum import Enum, unique
+from dataclasses import dataclass, replace
 from functools import cached_property
 from pathlib import Path, PurePath
 
@@ -20,34 +19,58 @@ from musicbot.defaults import (
     RATING_CHOICES,
     STORED_RATING_CHOICES,
 )
-from musicbot.folder import Folder
-from musicbot.helpers import current_user
+from musicbot.fast_tags import Tags, read_tags
 from musicbot.music import Music, MusicInput
 from musicbot.object import MusicbotObject
+from musicbot.tag_snapshot import Issue, TagSnapshot
 
 logger = logging.getLogger(__name__)
 # for pydub
 warnings.filterwarnings("ignore", category=SyntaxWarning)
 
 
-@unique
-class Issue(str, Enum):
-    NO_TITLE = "no-title"
-    NO_GENRE = "no-genre"
-    NO_ALBUM = "no-album"
-    NO_ARTIST = "no-artist"
-    NO_RATING = "no-rating"
-    NO_TRACK = "no-track"
-    INVALID_COMMENT = "invalid-comment"
-    INVALID_TITLE = "invalid-title"
-    INVALID_PATH = "invalid-path"
+FLAC_TAGS = (
+    "title",
+    "album",
+    "artist",
+    "genre",
+    "tracknumber",
+    "fmps_rating",
+    "description",
+    "comment",
+    "comm::xxx",
+    "comm:id3v1 comment:eng",
+)
+ID3_TAGS = (
+    "TIT2",
+    "TALB",
+    "TPE1",
+    "TCON",
+    "TRCK",
+    "TXXX:FMPS_Rating",
+    "COMM::XXX",
+    "COMM:ID3v1 Comment:eng",
+)
+
+
+@beartype
+def first_tag(tags: Tags, tag: str, default: str = "") -> str:
+    for item in tags.get(tag, []):
+        return item
+    return default
+
+
+@beartype
+def mutagen_tags(handle: Any, flac: bool) -> Tags:
+    """Same tags as the fast reader, read from a Mutagen handle"""
+    return {tag: [str(item) for item in handle[tag]] for tag in (FLAC_TAGS if flac else ID3_TAGS) if tag in handle}
 
 
 @beartype
 @dataclass
 class File(MusicbotObject):
     folder: Path
-    handle: Any
+    snapshot: TagSnapshot
 
     @classmethod
     def from_path(cls, folder: Path, path: Path) -> Self | None:
@@ -56,86 +79,129 @@ class File(MusicbotObject):
             return None
 
         try:
-            handle = MutagenFile(path.resolve())
-            file = cls(folder=folder.resolve(), handle=handle)
-            if file.handle.tags is None:
-                file.handle.add_tags()
+            folder = folder.resolve()
+            path = path.resolve()
+            if (fast := read_tags(path)) is not None:
+                tags, length = fast
+            else:
+                handle = MutagenFile(path)
+                if handle.tags is None:
+                    handle.add_tags()
+                tags, length = mutagen_tags(handle, flac=path.suffix == ".flac"), handle.info.length
+            snapshot, rating_str = cls.extract(folder=folder, path=path, tags=tags, length=length)
+            file = cls(folder=folder, snapshot=snapshot)
+            if rating_str is not None:
+                cls.warn(f"{file} : cannot convert rating to float : '{rating_str}', try fixing")
+                file.rating = 0.0
+                if not file.save():
+                    cls.err(f"{file} : unable to fix rating")
             return file
-        except MutagenError as error:
+        except (MutagenError, OSError) as error:
             cls.err(f"Unable to instanciate {path}", error=error)
         return None
 
+    @classmethod
+    def extract(cls, folder: Path, path: Path, tags: Tags, length: float) -> tuple[TagSnapshot, str | None]:
+        """Build the snapshot from raw tags, also returns the raw rating when it cannot be parsed"""
+        flac = path.suffix == ".flac"
+        stat = path.stat()
+
+        def first(tag: str) -> str:
+            return first_tag(tags, tag.lower() if flac else tag)
+
+        if comm := tags.get("comm::xxx" if flac else "COMM::XXX"):
+            comment = comm[0]
+        else:
+            comment = first("COMM:ID3v1 Comment:eng")
+        description = " ".join([first("description"), first("comment")]).strip()
+
+        if path.suffix == ".mp3":
+            keywords = frozenset(mysplit(comment, " "))
+        elif flac:
+            if comment and not description:
+                logger.warning(f"{path} : flac keywords stored in mp3 comment")
+            keywords = frozenset(mysplit(description or comment, " "))
+        else:
+            keywords = frozenset()
+
+        genre = first("genre" if flac else "TCON")
+        if not genre:
+            logger.debug(f"{path} : no genre set")
+
+        rating_str = first("fmps_rating" if flac else "TXXX:FMPS_Rating")
+        invalid_rating = None
+        try:
+            rating = float(rating_str)
+            if rating not in STORED_RATING_CHOICES:
+                cls.err(f"{path} : badly stored rating : '{rating}'", only_once=True)
+                rating = 0.0
+            else:
+                rating = min(max(rating * 5.0, DEFAULT_MIN_RATING), DEFAULT_MAX_RATING)
+        except ValueError:
+            invalid_rating = rating_str
+            rating = 0.0
+
+        snapshot = TagSnapshot(
+            folder=folder,
+            path=path,
+            title=first("title" if flac else "TIT2"),
+            album=first("album" if flac else "TALB"),
+            artist=first("artist" if flac else "TPE1"),
+            genre=genre,
+            rating=rating,
+            length=int(length),
+            size=stat.st_size,
+            keywords=keywords,
+            track=cls.parse_track(path, first("tracknumber" if flac else "TRCK")),
+            mtime=stat.st_mtime_ns,
+            comment=comment,
+            description=description,
+        )
+        return snapshot, invalid_rating
+
+    @staticmethod
+    def parse_track(path: Path, track: str) -> int | None:
+        try:
+            if "/" in track:
+                track = track.split("/", maxsplit=1)[0]
+            n = int(track)
+            if n < 0:
+                return -1
+            if n > 2**31 - 1:
+                logger.warning(f"{path} : invalid track number {n}")
+                return None
+            return n
+        except ValueError:
+            return None
+
+    @cached_property
+    def handle(self) -> Any:
+        """Mutagen handle, only opened when tags are written"""
+        handle = MutagenFile(self.path)
+        if handle.tags is None:
+            handle.add_tags()
+        return handle
+
+    def release(self) -> None:
+        _ = self.__dict__.pop("handle", None)
+
+    def update(self, **tags: Any) -> None:
+        self.snapshot = replace(self.snapshot, **tags)
+
     def __repr__(self) -> str:
         return str(self.path)
 
     @property
     def issues(self) -> set[Issue]:
-        issues = set()
-        if not self.title:
-            issues.add(Issue.NO_TITLE)
-        if not self.genre:
-            issues.add(Issue.NO_GENRE)
-        if not self.album:
-            issues.add(Issue.NO_ALBUM)
-        if not self.artist:
-            issues.add(Issue.NO_ARTIST)
-        if self.rating == -1:
-            issues.add(Issue.NO_RATING)
-        if self.track == -1:
-            issues.add(Issue.NO_TRACK)
-        if self.extension == ".flac" and self._comment and not self._description:
-            issues.add(Issue.INVALID_COMMENT)
-        if self.extension == ".mp3" and self._description and not self._comment:
-            issues.add(Issue.INVALID_COMMENT)
-        if self.track not in (-1, 0) and self.title != self.canonic_title:
-            logger.debug(f"{self} : invalid title, '{self.title}' should be '{self.canonic_title}'")
-            issues.add(Issue.INVALID_TITLE)
-        if self.track not in (-1, 0) and not str(self.path).endswith(str(self.canonic_artist_album_filename)):
-            logger.debug(f"{self} : invalid path, must have a track and should end with '{self.canonic_artist_album_filename}'")
-            issues.add(Issue.INVALID_PATH)
-        return issues
+        return self.snapshot.issues
 
     @property
     def music(self) -> Music | None:
-        if (public_ip := self.public_ip()) is None:
-            return None
-        folder = Folder(
-            name=str(self.folder),
-            path=self.path,
-            username=current_user(),
-            ipv4=public_ip,
-        )
-        return Music(
-            title=self.title,
-            size=self.size,
-            album=self.album,
-            artist=self.artist,
-            genre=self.genre,
-            length=self.length,
-            track=self.track,
-            rating=self.rating,
-            keywords=frozenset(self.keywords),
-            folders=frozenset({folder}),
-        )
+        return self.snapshot.music
 
     @property
     def music_input(self) -> MusicInput | None:
-        if (music := self.music) is None:
-            return None
-        if not music.folders:
-            self.err(f"{self} : no folder set")
-            return None
-
-        data = asdict(music)
-
-        folders = data.pop("folders")
-        folder = next(iter(folders))
-        data["keywords"] = list(data["keywords"])
-        data["ipv4"] = folder.ipv4
-        data["username"] = folder.username
-        data["folder"] = folder.name
-        data["path"] = str(folder.path)
-        return MusicInput(**data)
+        return self.snapshot.music_input
 
     def set_tags(
         self,
@@ -163,13 +229,17 @@ class File(MusicbotObject):
             self.track = track
         return self.save()
 
-    @cached_property
+    @property
     def size(self) -> int:
-        return self.path.stat().st_size
+        return self.snapshot.size
+
+    @property
+    def mtime(self) -> int | None:
+        return self.snapshot.mtime
 
     @property
     def path(self) -> Path:
-        return Path(self.handle.filename)
+        return self.snapshot.path
 
     @property
     def canonic_path(self) -> Path:
@@ -185,11 +255,11 @@ class File(MusicbotObject):
 
     @property
     def extension(self) -> str:
-        return self.path.suffix
+        return self.snapshot.extension
 
     @property
     def canonic_artist_album_filename(self) -> PurePath:
-        return PurePath(self.artist, self.album, self.canonic_filename)
+        return self.snapshot.canonic_artist_album_filename
 
     @property
     def filename(self) -> str:
@@ -197,14 +267,11 @@ class File(MusicbotObject):
 
     @property
     def canonic_title(self) -> str:
-        prefix = f"{str(self.track).zfill(2)} - "
-        if not self.title.startswith(prefix):
-            return f"{prefix}{self.title}"
-        return self.title
+        return self.snapshot.canonic_title
 
     @property
     def canonic_filename(self) -> str:
-        return f"{self.canonic_title}{self.extension}"
+        return self.snapshot.canonic_filename
 
     @property
     def flat_title(self) -> str:
@@ -218,22 +285,13 @@ class File(MusicbotObject):
     def flat_path(self) -> Path:
         return self.folder / self.flat_filename
 
-    def _get_first(self, tag: str, default: str = "") -> str:
-        if tag not in self.handle:
-            return default
-        for item in self.handle[tag]:
-            return str(item)
-        return default
-
     @property
     def length(self) -> int:
-        return int(self.handle.info.length)
+        return self.snapshot.length
 
     @property
     def title(self) -> str:
-        if self.extension == ".flac":
-            return self._get_first("title")
-        return self._get_first("TIT2")
+        return self.snapshot.title
 
     @title.setter
     def title(self, title: str) -> None:
@@ -241,12 +299,11 @@ class File(MusicbotObject):
             self.handle.tags["title"] = title
         else:
             self.handle.tags.add(id3.TIT2(text=title))
+        self.update(title=title)
 
     @property
     def album(self) -> str:
-        if self.extension == ".flac":
-            return self._get_first("album")
-        return self._get_first("TALB")
+        return self.snapshot.album
 
     @album.setter
     def album(self, album: str) -> None:
@@ -254,12 +311,11 @@ class File(MusicbotObject):
             self.handle.tags["album"] = album
         else:
             self.handle.tags.add(id3.TALB(text=album))
+        self.update(album=album)
 
     @property
     def artist(self) -> str:
-        if self.extension == ".flac":
-            return self._get_first("artist")
-        return self._get_first("TPE1")
+        return self.snapshot.artist
 
     @artist.setter
     def artist(self, artist: str) -> None:
@@ -267,16 +323,11 @@ class File(MusicbotObject):
             self.handle.tags["artist"] = artist
         else:
             self.handle.tags.add(id3.TPE1(text=artist))
+        self.update(artist=artist)
 
     @property
     def genre(self) -> str:
-        if self.extension == ".flac":
-            genre = self._get_first("genre")
-        else:
-            genre = self._get_first("TCON")
-        if not genre:
-            logger.debug(f"{self} : no genre set")
-        return genre
+        return self.snapshot.genre
 
     @genre.setter
     def genre(self, genre: str) -> None:
@@ -284,82 +335,49 @@ class File(MusicbotObject):
             self.handle.tags["genre"] = genre
         else:
             self.handle.tags.add(id3.TCON(text=genre))
+        self.update(genre=genre)
 
     @property
     def rating(self) -> float:
-        if self.extension == ".flac":
-            rating_str = self._get_first("fmps_rating")
-        else:
-            rating_str = self._get_first("TXXX:FMPS_Rating")
-        try:
-            rating = float(rating_str)
-            if rating not in STORED_RATING_CHOICES:
-                self.err(f"{self} : badly stored rating : '{rating}'", only_once=True)
-                return 0.0
-
-            rating *= 5.0
-            if rating < DEFAULT_MIN_RATING:
-                return DEFAULT_MIN_RATING
-            if rating > DEFAULT_MAX_RATING:
-                return DEFAULT_MAX_RATING
-            return rating
-        except ValueError:
-            self.warn(f"{self} : cannot convert rating to float : '{rating_str}', try fixing")
-            self.rating = 0.0
-            if not self.save():
-                self.err(f"{self} : unable to fix rating")
-            return 0.0
+        return self.snapshot.rating
 
     @rating.setter
     def rating(self, rating: float) -> None:
         if rating not in RATING_CHOICES:
             self.err(f"{self} : tried to set a bad rating : {rating}")
             return
-        rating /= 5.0
+        stored_rating = rating / 5.0
         if self.extension == ".flac":
-            self.handle["fmps_rating"] = str(rating)
+            self.handle["fmps_rating"] = str(stored_rating)
         else:
-            txxx = id3.TXXX(desc="FMPS_Rating", text=str(rating))
+            txxx = id3.TXXX(desc="FMPS_Rating", text=str(stored_rating))
             self.handle.tags.add(txxx)
+        self.update(rating=rating)
 
     @property
     def _comment(self) -> str:
-        comm = self.handle.get("COMM::XXX", None)
-        if comm is not None and len(comm.text) > 0:
-            return comm.text[0]
-        return self._get_first("COMM:ID3v1 Comment:eng")
+        return self.snapshot.comment
 
     @_comment.setter
     def _comment(self, comment: str) -> None:
         self.handle.tags.delall("COMM")
         comm = id3.COMM(desc="ID3v1 Comment", lang="eng", text=comment)
         self.handle.tags.add(comm)
+        self.update(comment=comment)
 
     @property
     def _description(self) -> str:
-        return " ".join([self._get_first("description"), self._get_first("comment")]).strip()
+        return self.snapshot.description
 
     @_description.setter
     def _description(self, description: str) -> None:
         self.handle.tags["description"] = description
         self.handle.tags["comment"] = description
+        self.update(description=description)
 
     @property
     def track(self) -> None | int:
-        track_tag = "tracknumber" if self.extension == ".flac" else "TRCK"
-        track = self._get_first(track_tag)
-        try:
-            if "/" in track:
-                track = track.split("/", maxsplit=1)[0]
-            n = int(track)
-            if n < 0:
-                return -1
-            if n > 2**31 - 1:
-                logger.warning(f"{self} : invalid track number {n}")
-                return None
-            return n
-        except ValueError:
-            return None
+        return self.snapshot.track
 
     @track.setter
     def track(self, number: int) -> None:
@@ -369,17 +387,11 @@ class File(MusicbotObject):
             self.handle.tags.delall("TRCK")
             trck = id3.TRCK(text=str(number))
             self.handle.tags.add(trck)
+        self.update(track=number)
 
     @property
     def keywords(self) -> set[str]:
-        if self.extension == ".mp3":
-            return set(mysplit(self._comment, " "))
-        if self.extension == ".flac":
-            if self._comment and not self._description:
-                logger.warning(f"{self} : fixing flac keywords with mp3 comment")
-                self._description = self._comment
-            return set(mysplit(self._description, " "))
-        return set()
+        return set(self.snapshot.keywords)
 
     @keywords.setter
     def keywords(self, keywords: set[str]) -> None:
@@ -391,6 +403,8 @@ class File(MusicbotObject):
             self._description = " ".join(keywords)
         else:
             self.err(f"{self} : unknown extension {self.extension}")
+            return
+        self.update(keywords=frozenset(keywords))
 
     def add_keywords(self, keywords: set[str]) -> bool:
         self.keywords = self.keywords.union(keywords)
@@ -541,15 +555,20 @@ class File(MusicbotObject):
                     logger.info(f"{self} : moving from {self.path} to {self.canonic_path}")
                     if not self.dry:
                         self.canonic_path.parent.mkdir(parents=True, exist_ok=True)
-                        shutil.move(self.path, self.canonic_path)
-                        self.handle = MutagenFile(self.canonic_path)
+                        canonic_path = self.canonic_path
+                        shutil.move(self.path, canonic_path)
+                        self.release()
+                        self.update(path=canonic_path)
         return self.save()
 
     def save(self) -> bool:
         try:
-            if self.dry:
+            if self.dry or "handle" not in self.__dict__:
                 return True
             self.handle.save()
+            self.release()
+            stat = self.path.stat()
+            self.update(size=stat.st_size, mtime=stat.st_mtime_ns)
             return True
         except MutagenError as error:
             self.err(f"{self} : unable to save", error=error)
@@ -0,0 +1,241 @@
+import logging
+import re
+from dataclasses import fields
+from functools import cache
+
+from beartype import beartype
+from beartype.typing import Any, Iterable
+
+from musicbot.music_filter import MusicFilter
+
+logger = logging.getLogger(__name__)
+
+MUSIC_SHAPE = """{
+    name,
+    size,
+    genre: {name},
+    album: {name},
+    artist: {name},
+    keywords: {name},
+    length,
+    track,
+    rating,
+    folders: {
+        name,
+        ipv4,
+        username,
+        path := @path
+    }
+}"""
+
+RANGES = {
+    "min_length": ".length >= <Length>${p}min_length",
+    "max_length": ".length <= <Length>${p}max_length",
+    "min_size": ".size >= <Size>${p}min_size",
+    "max_size": ".size <= <Size>${p}max_size",
+    "min_rating": ".rating >= <Rating>${p}min_rating",
+    "max_rating": ".rating <= <Rating>${p}max_rating",
+}
+TEXTS = {
+    "artist": ".artist.name",
+    "album": ".album.name",
+    "genre": ".genre.name",
+    "title": ".name",
+}
+KEYWORDS_SETS = {
+    "keywords_any": "any({p}keywords_any in .keywords)",
+    "keywords_all": "all({p}keywords_all in .keywords) and count({p}keywords_all) = len(<array<str>>${p}keywords_all)",
+    "keywords_none": "not any({p}keywords_none in .keywords)",
+}
+ORDER_BY = "order by .artist.name then .album.name then .track then .name"
+# pages are ordered by a total key, musics are unique by (name, album) and albums by (name, artist)
+PAGE_ORDER_BY = "order by .artist.name then .album.name then (.track ?? 0) then .name"
+AFTER = "(.artist.name, .album.name, .track ?? 0, .name) > (<str>$after_artist, <str>$after_album, <int64>$after_track, <str>$after_name)"
+# cheapest predicates first, regexes and trigram similarity are evaluated last
+COSTS = {"range": 0, "equal": 1, "empty": 1, "set": 2, "like": 3, "ilike": 3, "regex": 4, "pattern": 5}
+
+REGEX_SPECIALS = r".^$*+?{}\[\]\\|()"
+LITERAL = re.compile(rf"^(\(\?i\))?\^([^{REGEX_SPECIALS}]*)\$$")
+CONTAINS = re.compile(rf"^[^{REGEX_SPECIALS}]+$")
+
+Shape = tuple[tuple[str, str], ...]
+
+
+@beartype
+def escape_like(literal: str) -> str:
+    """Literal pattern for like, backslashes are escaped first so that they do not swallow the escapes of wildcards"""
+    return literal.replace("\\", "\\\\").replace("%", r"\%").replace("_", r"\_")
+
+
+@beartype
+def text_predicate(value: str) -> tuple[str, str]:
+    """Kind of predicate and its argument for a regex, anchored or plain literals do not need a regex engine"""
+    if (literal := LITERAL.match(value)) is not None:
+        if literal.group(1):
+            return "ilike", escape_like(literal.group(2))
+        return "equal", literal.group(2)
+    if CONTAINS.match(value):
+        return "like", f"%{escape_like(value)}%"
+    return "regex", value
+
+
+@beartype
+def clause(name: str, kind: str, prefix: str) -> str:
+    if kind == "range":
+        return RANGES[name].format(p=prefix)
+    if kind == "set":
+        return KEYWORDS_SETS[name].format(p=prefix)
+    if kind == "pattern":
+        return f"ext::pg_trgm::word_similar(<str>${prefix}pattern, .title)"
+    if name == "keyword":
+        if kind == "empty":
+            return "not exists .keywords"
+        return f're_test(<str>${prefix}keyword, array_join(array_agg((select .keywords.name)), " "))'
+    path = TEXTS[name]
+    if kind == "equal":
+        return f"{path} = <str>${prefix}{name}"
+    if kind in ("like", "ilike"):
+        return f"{path} {kind} <str>${prefix}{name}"
+    return f"re_test(<str>${prefix}{name}, {path})"
+
+
+@beartype
+def select_musics(shape: Shape, prefix: str, after: bool = False) -> str:
+    clauses = [clause(name, kind, prefix) for name, kind in sorted(shape, key=lambda item: COSTS.get(item[1], 0)) if kind != "limit"]
+    limited = ("limit", "limit") in shape
+    if after and not limited:
+        # a limited filter must be evaluated whole, the keyset is only applied after its limit
+        clauses.append(AFTER)
+    select = "select Music"
+    if clauses:
+        select += "\n        filter " + "\n            and ".join(clauses)
+    if limited:
+        select += f"\n        {ORDER_BY}\n        limit <`Limit`>${prefix}limit"
+    return f"({select})"
+
+
+@beartype
+def union_aliases(shapes: tuple[Shape, ...], after: bool = False) -> list[str]:
+    """Aliases of the keywords sets of each filter, and of the deduplicated union of their musics"""
+    aliases: list[str] = []
+    selects: list[str] = []
+    for index, shape in enumerate(shapes):
+        prefix = f"f{index}_"
+        aliases.extend(f"{prefix}{name} := (select Keyword filter .name in array_unpack(<array<str>>${prefix}{name}))" for name, kind in shape if kind == "set")
+        selects.append(select_musics(shape, prefix, after))
+    aliases.append("musics := distinct {\n        " + ",\n        ".join(selects) + "\n    }")
+    return aliases
+
+
+@cache
+def compile_shapes(shapes: tuple[Shape, ...], paged: bool = False, after: bool = False) -> str:
+    """EdgeQL playlist query for a tuple of filter shapes, filters with the same non-default fields share it
+
+    Each filter selects its musics with its own limit, the union is deduplicated by the database and ordered once.
+    Paged queries return page_size musics, after the key of the last music of the previous page.
+    """
+    query = "with\n    " + ",\n    ".join(union_aliases(shapes, after)) + f"\nselect musics {MUSIC_SHAPE}"
+    if after:
+        query += f"\nfilter {AFTER}"
+    if paged:
+        query += f"\n{PAGE_ORDER_BY}\nlimit <int64>$page_size"
+    else:
+        query += f"\n{ORDER_BY}"
+    logger.debug(f"compiled playlist query for shapes {shapes} :\n{query}")
+    return query
+
+
+@cache
+def compile_bests_shapes(shapes: tuple[Shape, ...]) -> str:
+    """EdgeQL bests query for a tuple of filter shapes, each music is returned once and groups only reference ids"""
+    music_shape = MUSIC_SHAPE.replace("{\n", "{\n    id,\n", 1)
+    query = "with\n    " + ",\n    ".join(union_aliases(shapes)) + f"""
+select {{
+    musics := (select musics {music_shape.replace(chr(10), chr(10) + "    ")} {ORDER_BY}),
+    genres := (group musics using name := .genre.name by name) {{
+        name := .key.name,
+        ids := .elements.id
+    }},
+    ratings := (group musics by .rating) {{
+        rating := .key.rating,
+        ids := .elements.id
+    }},
+    ratings_for_artist := (group musics using artist := .artist.name by artist, .rating) {{
+        artist := .key.artist,
+        rating := .key.rating,
+        ids := .elements.id
+    }},
+    keywords := (
+        with used_keywords := musics.keywords
+        select used_keywords {{
+            name,
+            ids := (.musics intersect musics).id
+        }}
+    ),
+    keywords_for_artist := (
+        with artists := (group musics using artist := .artist.name by artist)
+        select artists {{
+            artist := .key.artist,
+            keywords := (
+                with artist_keywords := artists.elements.keywords
+                select artist_keywords {{
+                    name,
+                    ids := (.musics intersect artists.elements).id
+                }}
+            )
+        }}
+    )
+}}"""
+    logger.debug(f"compiled bests query for shapes {shapes} :\n{query}")
+    return query
+
+
+@beartype
+def filter_shape(music_filter: MusicFilter) -> tuple[Shape, dict[str, Any]]:
+    """Non-default fields of a filter with their predicate kind, and their arguments"""
+    shape = []
+    arguments: dict[str, Any] = {}
+    for field in fields(MusicFilter):  # pylint: disable=not-an-iterable
+        value = getattr(music_filter, field.name)
+        if value == field.default:
+            continue
+        if field.name in RANGES:
+            kind = "range"
+        elif field.name in KEYWORDS_SETS:
+            kind = "set"
+            value = sorted(value)
+        elif field.name == "keyword":
+            kind = "empty" if value == "^$" else "regex"
+        elif field.name in TEXTS:
+            kind, value = text_predicate(value)
+        else:
+            kind = field.name
+        shape.append((field.name, kind))
+        if kind != "empty":
+            arguments[field.name] = value
+    return tuple(shape), arguments
+
+
+@beartype
+def compile_filters(
+    music_filters: Iterable[MusicFilter],
+    page_size: int | None = None,
+    after: tuple[str, str, int, str] | None = None,
+) -> tuple[str, dict[str, Any]]:
+    """Single playlist query unioning all filters, clauses left to their default value are dropped"""
+    shaped = sorted((filter_shape(music_filter) for music_filter in music_filters), key=lambda item: (item[0], repr(item[1])))
+    arguments = {f"f{index}_{name}": value for index, (_, filter_arguments) in enumerate(shaped) for name, value in filter_arguments.items()}
+    if page_size is not None:
+        arguments["page_size"] = page_size
+    if after is not None:
+        arguments.update(zip(("after_artist", "after_album", "after_track", "after_name"), after))
+    query = compile_shapes(tuple(shape for shape, _ in shaped), paged=page_size is not None, after=after is not None)
+    return query, arguments
+
+
+@beartype
+def compile_bests(music_filters: Iterable[MusicFilter]) -> tuple[str, dict[str, Any]]:
+    """Single bests query grouping the union of all filters"""
+    shaped = sorted((filter_shape(music_filter) for music_filter in music_filters), key=lambda item: (item[0], repr(item[1])))
+    arguments = {f"f{index}_{name}": value for index, (_, filter_arguments) in enumerate(shaped) for name, value in filter_arguments.items()}
+    return compile_bests_shapes(tuple(shape for shape, _ in shaped)), arguments
@@ -1,5 +1,4 @@
 import asyncio
-import codecs
 import logging
 import shutil
 from pathlib import Path
@@ -16,9 +15,15 @@ from musicbot import (
     PlaylistOptions,
     ScanFolders,
 )
+from musicbot.playlist_writers import WRITERS, render, write_playlists
 
 logger = logging.getLogger(__name__)
 
+PIKE_RATINGS = [4.0, 4.5, 5.0]
+# playlists generated by bests, by genre, keyword and rating at the root, by keyword and rating in artist folders
+BESTS_PLAYLISTS = ("*.m3u", "*/keyword_*.m3u", "*/rating_*.m3u")
+PIKES_PLAYLISTS = ("Buckethead/Pikes/*.m3u",)
+
 
 async def playlist(
     output: str,
@@ -29,6 +34,18 @@ async def playlist(
 ) -> None:
     if out.name.endswith(".m3u"):
         output = "m3u"
+    elif out.name.endswith(".m3u8"):
+        output = "m3u8"
+
+    if output in WRITERS and not playlist_options.shuffle and not playlist_options.interleave:
+        await stream_playlist(
+            output=output,
+            music_filters=music_filters,
+            playlist_options=playlist_options,
+            musicdb=musicdb,
+            out=out,
+        )
+        return
 
     new_playlist = await musicdb.make_playlist(
         music_filters=frozenset(music_filters),
@@ -40,37 +57,69 @@ async def playlist(
     )
 
 
+async def stream_playlist(
+    output: str,
+    music_filters: list[MusicFilter],
+    playlist_options: PlaylistOptions,
+    musicdb: MusicDb,
+    out: click.utils.LazyFile,
+) -> None:
+    """Write a playlist page by page, musics are never all loaded at once"""
+    name = " | ".join([music_filter.help_repr() for music_filter in music_filters])
+    writer = WRITERS[output](name=name, file=out, playlist_options=playlist_options)
+    async for music in musicdb.iter_playlist(music_filters=frozenset(music_filters)):
+        writer.write(music)
+    writer.close()
+
+
 async def bests(
     musicdb: MusicDb,
     music_filters: list[MusicFilter],
     path: Path,
     min_playlist_size: int,
     playlist_options: PlaylistOptions,
-) -> None:
+) -> list[Path]:
+    """Write bests playlists whose content changed, returns the paths of all generated playlists"""
     musicdb.set_readonly()
     bests = await musicdb.make_bests(
         music_filters=frozenset(music_filters),
     )
+    contents: dict[Path, str] = {}
     for best in bests:
         if len(best.musics) < min_playlist_size or not best.name:
             MusicbotObject.warn(f"{best.name} : size < {min_playlist_size}")
             continue
-        filepath = path / (best.name + ".m3u")
-        if MusicbotObject.dry:
-            MusicbotObject.success(f"DRY RUN: Writing playlist {best.name} to {filepath}")
-            continue
-        try:
-            filepath.parent.mkdir(parents=True, exist_ok=True)
-            with codecs.open(str(filepath), "w", "utf-8-sig") as playlist_file:
-                best.print(
-                    output="m3u",
-                    file=playlist_file,
-                    playlist_options=playlist_options,
-                )
-        except (OSError, LookupError, ValueError, UnicodeError) as e:
-            logger.warning(f"Unable to write playlist {best.name} to {filepath} because of {e}")
-
-    MusicbotObject.success(f"Playlists: {len(bests)}")
+        contents[path / (best.name + ".m3u")] = render(best.name, best.musics, playlist_options=playlist_options)
+    written = write_playlists(contents)
+    MusicbotObject.success(f"Playlists: {len(bests)} | Rewritten: {len(written)} | Unchanged: {len(contents) - len(written)}")
+    return list(contents)
+
+
+async def pikes(
+    musicdb: MusicDb,
+    path: Path,
+    playlist_options: PlaylistOptions,
+) -> list[Path]:
+    """Buckethead pike playlists by keyword and by rating, partitioned in memory from a single query"""
+    musicdb.set_readonly()
+    pikes = await musicdb.make_playlist(
+        music_filters=frozenset([MusicFilter(artist="Buckethead", min_rating=min(PIKE_RATINGS), keywords_all=frozenset({"pike"}))]),
+    )
+    pike_keywords = sorted({keyword for music in pikes.musics for keyword in music.keywords} - {"pike"})
+    contents: dict[Path, str] = {}
+    for rating in PIKE_RATINGS:
+        rated = [music for music in pikes.musics if music.rating >= rating]
+        for pike_keyword in pike_keywords:
+            if musics := [music for music in rated if pike_keyword in music.keywords]:
+                music_filter = MusicFilter(artist="Buckethead", min_rating=rating, keywords_all=frozenset({"pike", pike_keyword}))
+                contents[path / "Buckethead" / "Pikes" / f"{pike_keyword}_{rating}.m3u"] = render(music_filter.help_repr(), musics, playlist_options=playlist_options)
+        if rated:
+            music_filter = MusicFilter(artist="Buckethead", min_rating=rating, keywords_all=frozenset({"pike"}))
+            contents[path / "Buckethead" / "Pikes" / f"rating_{rating}.m3u"] = render(music_filter.help_repr(), rated, playlist_options=playlist_options)
+    # pike playlists have always been written without a BOM
+    written = write_playlists(contents, encoding="utf-8")
+    MusicbotObject.success(f"Pike playlists: {len(contents)} | Rewritten: {len(written)} | Unchanged: {len(contents) - len(written)}")
+    return list(contents)
 
 
 async def upsert_musics(
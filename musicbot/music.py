@@ -2,6 +2,7 @@ import logging
 from dataclasses import asdict, dataclass
 from pathlib import Path
 
+import gel
 from beartype import beartype
 from beartype.typing import Any, Self
 from slugify import slugify
@@ -46,6 +47,21 @@ class Music(MusicbotObject):
             track=data["track"],
         )
 
+    @classmethod
+    def from_gel(cls, result: gel.Object) -> Self:
+        return cls(
+            title=result.name,
+            artist=result.artist.name,
+            album=result.album.name,
+            genre=result.genre.name,
+            size=result.size,
+            length=result.length,
+            keywords=frozenset(keyword.name for keyword in result.keywords),
+            track=result.track,
+            rating=result.rating,
+            folders=frozenset(Folder(path=Path(folder.path), name=folder.name, ipv4=folder.ipv4, username=folder.username) for folder in result.folders),
+        )
+
     def human_repr(self) -> str:
         data: dict[str, Any] = asdict(self)
         data["size"] = bytes_to_human(data["size"])
@@ -87,3 +103,4 @@ class MusicInput(MusicbotObject):
     folder: str
     path: str
     track: int | None = None
+    mtime: int | None = None
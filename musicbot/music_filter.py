@@ -24,6 +24,9 @@ logger = logging.getLogger(__name__)
 class MusicFilter(MusicbotObject):
     genre: str = MATCH_ALL
     keyword: str = MATCH_ALL
+    keywords_any: frozenset[str] = frozenset()
+    keywords_all: frozenset[str] = frozenset()
+    keywords_none: frozenset[str] = frozenset()
     artist: str = MATCH_ALL
     title: str = MATCH_ALL
     album: str = MATCH_ALL
@@ -57,8 +60,11 @@ class MusicFilter(MusicbotObject):
     def _short_repr(self) -> dict[str, int | str | float]:
         self_dict = asdict(self)
         for field_attribute in fields(MusicFilter):  # pylint: disable=not-an-iterable
-            if self_dict[field_attribute.name] == field_attribute.default:
+            value = self_dict[field_attribute.name]
+            if value == field_attribute.default:
                 del self_dict[field_attribute.name]
+            elif isinstance(value, frozenset):
+                self_dict[field_attribute.name] = " ".join(sorted(value))
         return self_dict
 
     def __repr__(self) -> str:
@@ -72,17 +78,17 @@ class MusicFilter(MusicbotObject):
         return ",".join([f"{k}={v}" for k, v in self._short_repr().items()]) or "default"
 
 
-NO_KEYWORD = "^((?!cutoff|bad|demo|intro).)$"
+NO_KEYWORDS = frozenset({"cutoff", "bad", "demo", "intro"})
 
 DEFAULT_PREFILTERS = {
-    "to-fix": MusicFilter(keyword="(tofix|todo|spotify-error)"),
+    "to-fix": MusicFilter(keywords_any=frozenset({"tofix", "todo", "spotify-error"})),
     "no-artist": MusicFilter(artist="^$"),
     "no-album": MusicFilter(album="^$"),
     "no-title": MusicFilter(title="^$"),
     "no-genre": MusicFilter(genre="^$"),
     "no-keyword": MusicFilter(keyword="^$"),
     "no-rating": MusicFilter(min_rating=0.0, max_rating=0.0),
-    "bests-4.0": MusicFilter(min_rating=4.0, keyword=NO_KEYWORD),
-    "bests-4.5": MusicFilter(min_rating=4.5, keyword=NO_KEYWORD),
-    "bests-5.0": MusicFilter(min_rating=5.0, keyword=NO_KEYWORD),
+    "bests-4.0": MusicFilter(min_rating=4.0, keywords_none=NO_KEYWORDS),
+    "bests-4.5": MusicFilter(min_rating=4.5, keywords_none=NO_KEYWORDS),
+    "bests-5.0": MusicFilter(min_rating=5.0, keywords_none=NO_KEYWORDS),
 }
@@ -1,6 +1,11 @@
+import asyncio
 import logging
 import os
-from dataclasses import dataclass, field
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from functools import partial
 from pathlib import Path
 from urllib.parse import urlparse
 from uuid import UUID
@@ -9,23 +14,35 @@ import gel
 import httpx
 from async_lru import alru_cache
 from beartype import beartype
-from beartype.typing import Self
+from beartype.typing import AsyncIterator, Awaitable, Callable, Self
 from gel.asyncio_client import AsyncIOClient, create_async_client
 from gel.options import RetryOptions, TransactionOptions
 
+from musicbot.adaptive_limiter import AdaptiveLimiter
+from musicbot.defaults import DEFAULT_BACKOFF, DEFAULT_PAGE_SIZE, DEFAULT_RETRIES
+from musicbot.filter_compiler import compile_bests, compile_filters, escape_like
 from musicbot.folder import Folder
+from musicbot.helpers import current_user
 from musicbot.music import Music, MusicInput
 from musicbot.music_filter import MusicFilter
 from musicbot.object import MusicbotObject
-from musicbot.playlist import Playlist
+from musicbot.playlist import Bests, Playlist
+from musicbot.queries.bulk_upsert_musics_async_edgeql import bulk_upsert_musics
 from musicbot.queries.delete_musics_async_edgeql import delete_musics
 from musicbot.queries.drop_schema_async_edgeql import drop_schema
-from musicbot.queries.gen_bests_async_edgeql import gen_bests
-from musicbot.queries.gen_playlist_async_edgeql import gen_playlist
-from musicbot.queries.pike_keywords_async_edgeql import pike_keywords
+from musicbot.queries.refresh_stats_async_edgeql import refresh_stats
 from musicbot.queries.remove_async_edgeql import RemoveResult, remove
+from musicbot.queries.remove_folder_prefix_async_edgeql import (
+    RemoveFolderPrefixResult,
+    remove_folder_prefix,
+)
+from musicbot.queries.remove_musics_paths_async_edgeql import (
+    RemoveMusicsPathsResult,
+    remove_musics_paths,
+)
 from musicbot.queries.select_artists_async_edgeql import select_artists
 from musicbot.queries.select_folder_async_edgeql import select_folder
+from musicbot.queries.select_paths_async_edgeql import select_paths
 from musicbot.queries.soft_clean_async_edgeql import soft_clean
 from musicbot.queries.upsert_album_async_edgeql import upsert_album
 from musicbot.queries.upsert_artist_async_edgeql import upsert_artist
@@ -33,6 +50,8 @@ from musicbot.queries.upsert_folder_async_edgeql import upsert_folder
 from musicbot.queries.upsert_genre_async_edgeql import upsert_genre
 from musicbot.queries.upsert_keyword_async_edgeql import upsert_keyword
 from musicbot.queries.upsert_music_async_edgeql import upsert_music
+from musicbot.queries.warm_upsert_cache_async_edgeql import warm_upsert_cache
+from musicbot.scan_stats import ScanStats
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +68,7 @@ class UpsertCache:
     artists_and_albums: dict[str, ArtistAlbums] = field(default_factory=dict)
     genres: dict[str, UUID] = field(default_factory=dict)
     keywords: dict[str, UUID] = field(default_factory=dict)
+    warmed: bool = False
 
 
 @beartype
@@ -57,6 +77,10 @@ class MusicDb(MusicbotObject):
     client: AsyncIOClient
     graphql: str
     upsert_cache: UpsertCache = field(default_factory=UpsertCache, hash=False)
+    stats: ScanStats = field(default_factory=ScanStats, hash=False)
+    warm_lock: asyncio.Lock = field(default_factory=asyncio.Lock, hash=False)
+    inflight: dict[tuple[str, ...], asyncio.Future[UUID]] = field(default_factory=dict, hash=False)
+    limiter: AdaptiveLimiter = field(default_factory=AdaptiveLimiter, hash=False)
 
     def __repr__(self) -> str:
         return self.dsn
@@ -86,7 +110,7 @@ class MusicDb(MusicbotObject):
         if graphql is None:
             parsed = urlparse(dsn)
             graphql = f"https://{parsed.username}:{parsed.password}@{parsed.hostname}:{parsed.port}/db/edgedb/graphql"
-        return cls(client=client, graphql=graphql)
+        return cls(client=client, graphql=graphql, limiter=AdaptiveLimiter(max_limit=MusicbotObject.coroutines))
 
     @property
     def graphiql(self) -> str:
@@ -120,6 +144,17 @@ class MusicDb(MusicbotObject):
     async def artists(self) -> list[gel.Object]:
         return await select_artists(self.client)
 
+    async def known_paths(self, folders: list[str]) -> dict[str, tuple[int, int | None]]:
+        """Size and modification time of each music path already stored for these folders"""
+        async with self.slot():
+            results = await select_paths(self.client, folders=folders)
+        paths = {}
+        for result in results:
+            for folder in result.folders:
+                if folder.path is not None:
+                    paths[folder.path] = (result.size, folder.mtime)
+        return paths
+
     async def make_playlist(
         self,
         music_filters: frozenset[MusicFilter] = frozenset(),
@@ -127,112 +162,212 @@ class MusicDb(MusicbotObject):
         if not music_filters:
             music_filters = frozenset([MusicFilter()])
 
-        results = set()
-        for music_filter in music_filters:
-            intermediate_results = await gen_playlist(
-                self.client,
-                min_length=music_filter.min_length,
-                max_length=music_filter.max_length,
-                min_size=music_filter.min_size,
-                max_size=music_filter.max_size,
-                min_rating=music_filter.min_rating,
-                max_rating=music_filter.max_rating,
-                artist=music_filter.artist,
-                album=music_filter.album,
-                genre=music_filter.genre,
-                title=music_filter.title,
-                keyword=music_filter.keyword,
-                pattern=music_filter.pattern,
-                limit=music_filter.limit,
-            )
-            results.update(intermediate_results)
+        query, arguments = compile_filters(music_filters)
+        async with self.slot():
+            results = await self.client.query(query, **arguments)
         name = " | ".join([music_filter.help_repr() for music_filter in music_filters])
         return Playlist.from_gel(
             name=name,
             results=list(results),
         )
 
+    async def iter_playlist(
+        self,
+        music_filters: frozenset[MusicFilter] = frozenset(),
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[Music]:
+        """Yield musics page by page, each page starts after the ordering key of the previous one"""
+        if not music_filters:
+            music_filters = frozenset([MusicFilter()])
+
+        after = None
+        while True:
+            query, arguments = compile_filters(music_filters, page_size=page_size, after=after)
+            async with self.slot():
+                results = await self.client.query(query, **arguments)
+            for result in results:
+                yield Music.from_gel(result)
+            if len(results) < page_size:
+                return
+            last = results[-1]
+            after = (last.artist.name, last.album.name, last.track or 0, last.name)
+
     async def clean_musics(self) -> None:
         if not self.dry:
             _ = await delete_musics(self.client)
-
-    async def pike_keywords(self) -> list[str]:
-        return await pike_keywords(self.client)
+            self.upsert_cache = UpsertCache()
 
     async def drop(self) -> None:
         if not self.dry:
             await drop_schema(self.client)
+            self.upsert_cache = UpsertCache()
 
     async def soft_clean(self) -> None:
         if not self.dry:
             cleaned = await soft_clean(self.client)
+            # cached ids may belong to deleted entities
+            self.upsert_cache = UpsertCache()
             self.success(f"cleaned {cleaned.musics_deleted} musics")
             self.success(f"cleaned {cleaned.artists_deleted} artists")
             self.success(f"cleaned {cleaned.albums_deleted} albums")
             self.success(f"cleaned {cleaned.genres_deleted} genres")
             self.success(f"clceaned {cleaned.keywords_deleted} keywords")
+            await self.refresh_stats()
+
+    async def refresh_stats(self) -> None:
+        """Recompute the stored statistics of folders, artists, albums, genres and keywords from their musics"""
+        if self.dry:
+            return
+        async with self.slot("refresh stats"):
+            refreshed = await refresh_stats(self.client)
+        logger.info(f"{self} : refreshed stats of {refreshed.folders_refreshed} folders, {refreshed.artists_refreshed} artists, {refreshed.albums_refreshed} albums")
 
     async def remove_music_path(self, path: str) -> None | list[RemoveResult]:
         logger.debug(f"{self} : removed {path}")
         if self.dry:
             return None
-        return await remove(self.client, path=path)
+        async with self.slot():
+            return await remove(self.client, path=path)
+
+    async def remove_music_paths(self, paths: list[str]) -> None | list[RemoveMusicsPathsResult]:
+        """Unlink many paths in one statement"""
+        logger.debug(f"{self} : removed {len(paths)} paths")
+        if self.dry or not paths:
+            return None
+        async with self.slot():
+            return await remove_musics_paths(self.client, paths=paths)
+
+    async def remove_folder(self, directory: str) -> None | list[RemoveFolderPrefixResult]:
+        """Unlink every path under a directory in one statement"""
+        logger.debug(f"{self} : removed {directory}")
+        if self.dry:
+            return None
+        prefix = escape_like(directory.rstrip(os.sep) + os.sep)
+        async with self.slot():
+            return await remove_folder_prefix(self.client, prefix=prefix)
+
+    async def warm_upsert_cache(self) -> None:
+        """Load ids of all artists with their albums, genres, keywords and folders of this host in one query"""
+        async with self.warm_lock:
+            if self.upsert_cache.warmed:
+                return
+            async with self.slot():
+                result = await warm_upsert_cache(self.client, username=current_user(), ipv4=self.public_ip() or "")
+            for artist in result.artists:
+                self.upsert_cache.artists_and_albums[artist.name] = ArtistAlbums(id=artist.id, albums={album.name: album.id for album in artist.albums})
+            self.upsert_cache.genres.update((genre.name, genre.id) for genre in result.genres)
+            self.upsert_cache.keywords.update((keyword.name, keyword.id) for keyword in result.keywords)
+            self.upsert_cache.folders.update((folder.name, folder.id) for folder in result.folders)
+            self.upsert_cache.warmed = True
+            logger.info(f"{self} : upsert cache warmed with {len(result.artists)} artists, {len(result.genres)} genres, {len(result.keywords)} keywords")
+
+    @asynccontextmanager
+    async def slot(self, kind: str = "query") -> AsyncIterator[None]:
+        """Hold a query slot of the adaptive concurrency limit"""
+        try:
+            async with self.limiter.slot(kind):
+                yield
+        finally:
+            self.stats.gauges["concurrency limit"] = self.limiter.limit
+            self.stats.gauges["concurrency decreases"] = self.limiter.decreases
+
+    @staticmethod
+    async def backoff(attempt: int) -> None:
+        """Exponential backoff with full jitter, so that conflicting transactions do not retry in lockstep"""
+        await asyncio.sleep(random.uniform(0, DEFAULT_BACKOFF * 2**attempt))
+
+    async def single_flight(self, key: tuple[str, ...], upsert: Callable[[], Awaitable[UUID]]) -> UUID:
+        """Watch upserts of a key are run once, concurrent callers await its result, scans deduplicate entities per chunk instead"""
+        if (future := self.inflight.get(key)) is not None:
+            self.stats.count("coalesced watch upserts")
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            async with self.slot():
+                result = await upsert()
+            future.set_result(result)
+            return result
+        except Exception as error:
+            future.set_exception(error)
+            # mark the error as retrieved, nobody may be waiting for it
+            _ = future.exception()
+            raise
+        finally:
+            if not future.done():
+                _ = future.cancel()
+            del self.inflight[key]
 
     async def upsert_music(self, music_input: MusicInput) -> Music | None:
         if self.dry:
             return None
 
-        retries = 3
+        await self.warm_upsert_cache()
+
+        retries = DEFAULT_RETRIES
         last_error = None
+        start = time.perf_counter()
 
         while retries > 0:
             try:
-                if music_input.artist not in self.upsert_cache.artists_and_albums:
-                    artist_id = await upsert_artist(self.client, artist=music_input.artist)
-                    self.upsert_cache.artists_and_albums[music_input.artist] = ArtistAlbums(id=artist_id)
+                upsert_cache = self.upsert_cache
+                self.stats.cache("artists", hit=music_input.artist in upsert_cache.artists_and_albums)
+                if music_input.artist not in upsert_cache.artists_and_albums:
+                    artist_id = await self.single_flight(("artist", music_input.artist), partial(upsert_artist, self.client, artist=music_input.artist))
+                    artist_albums = upsert_cache.artists_and_albums.setdefault(music_input.artist, ArtistAlbums(id=artist_id))
                 else:
-                    artist_id = self.upsert_cache.artists_and_albums[music_input.artist].id
-
-                if music_input.folder not in self.upsert_cache.folders:
-                    folder_id = await upsert_folder(self.client, username=music_input.username, ipv4=music_input.ipv4, folder=music_input.folder)
-                    self.upsert_cache.folders[music_input.folder] = folder_id
+                    artist_albums = upsert_cache.artists_and_albums[music_input.artist]
+                    artist_id = artist_albums.id
+
+                self.stats.cache("folders", hit=music_input.folder in upsert_cache.folders)
+                if music_input.folder not in upsert_cache.folders:
+                    upsert = partial(upsert_folder, self.client, username=music_input.username, ipv4=music_input.ipv4, folder=music_input.folder)
+                    folder_id = await self.single_flight(("folder", music_input.folder), upsert)
+                    upsert_cache.folders[music_input.folder] = folder_id
                 else:
-                    folder_id = self.upsert_cache.folders[music_input.folder]
+                    folder_id = upsert_cache.folders[music_input.folder]
 
-                if music_input.genre not in self.upsert_cache.genres:
-                    genre_id = await upsert_genre(self.client, genre=music_input.genre)
-                    self.upsert_cache.genres[music_input.genre] = genre_id
+                self.stats.cache("genres", hit=music_input.genre in upsert_cache.genres)
+                if music_input.genre not in upsert_cache.genres:
+                    genre_id = await self.single_flight(("genre", music_input.genre), partial(upsert_genre, self.client, genre=music_input.genre))
+                    upsert_cache.genres[music_input.genre] = genre_id
                 else:
-                    genre_id = self.upsert_cache.genres[music_input.genre]
+                    genre_id = upsert_cache.genres[music_input.genre]
 
                 keyword_ids = []
                 for keyword in music_input.keywords:
-                    if keyword not in self.upsert_cache.keywords:
-                        keyword_id = await upsert_keyword(self.client, keyword=keyword)
-                        self.upsert_cache.keywords[keyword] = keyword_id
+                    self.stats.cache("keywords", hit=keyword in upsert_cache.keywords)
+                    if keyword not in upsert_cache.keywords:
+                        keyword_id = await self.single_flight(("keyword", keyword), partial(upsert_keyword, self.client, keyword=keyword))
+                        upsert_cache.keywords[keyword] = keyword_id
                     else:
-                        keyword_id = self.upsert_cache.keywords[keyword]
+                        keyword_id = upsert_cache.keywords[keyword]
                     keyword_ids.append(keyword_id)
 
-                if music_input.album not in self.upsert_cache.artists_and_albums[music_input.artist].albums:
-                    album_id = await upsert_album(self.client, album=music_input.album, artist=artist_id)
-                    self.upsert_cache.artists_and_albums[music_input.artist].albums[music_input.album] = album_id
+                self.stats.cache("albums", hit=music_input.album in artist_albums.albums)
+                if music_input.album not in artist_albums.albums:
+                    upsert = partial(upsert_album, self.client, album=music_input.album, artist=artist_id)
+                    album_id = await self.single_flight(("album", music_input.artist, music_input.album), upsert)
+                    artist_albums.albums[music_input.album] = album_id
                 else:
-                    album_id = self.upsert_cache.artists_and_albums[music_input.artist].albums[music_input.album]
-
-                result = await upsert_music(
-                    self.client,
-                    title=music_input.title,
-                    folder=folder_id,
-                    path=music_input.path,
-                    size=music_input.size,
-                    length=music_input.length,
-                    rating=music_input.rating,
-                    keywords=keyword_ids,
-                    album=album_id,
-                    genre=genre_id,
-                    track=music_input.track,
-                )
+                    album_id = artist_albums.albums[music_input.album]
+
+                async with self.slot():
+                    result = await upsert_music(
+                        self.client,
+                        title=music_input.title,
+                        folder=folder_id,
+                        path=music_input.path,
+                        size=music_input.size,
+                        length=music_input.length,
+                        rating=music_input.rating,
+                        keywords=keyword_ids,
+                        album=album_id,
+                        genre=genre_id,
+                        track=music_input.track,
+                        mtime=music_input.mtime,
+                    )
 
                 # result = await upsert_music(
                 #     self.client,
@@ -265,11 +400,14 @@ class MusicDb(MusicbotObject):
                     folders=frozenset(folders),
                 )
                 self.success(f"{self} : updated {music_input}")
+                self.stats.latencies.append(time.perf_counter() - start)
                 return music
             except gel.errors.TransactionSerializationError as error:
                 retries -= 1
+                self.stats.count("retries")
                 self.warn(f"{music_input} : transaction error, {retries} retries left")
                 last_error = error
+                await self.backoff(DEFAULT_RETRIES - retries)
                 continue
             except gel.errors.NoDataError as error:
                 self.err(f"{music_input} : no data result for query", error=error)
@@ -279,6 +417,61 @@ class MusicDb(MusicbotObject):
         self.err(f"{self} : too many transaction failures", error=last_error)
         return None
 
+    async def upsert_musics(self, music_inputs: list[MusicInput]) -> list[Music]:
+        """Upsert a chunk of musics in one round-trip, the same music found in several folders is deferred to the next round-trip"""
+        if self.dry:
+            return []
+
+        rounds: list[dict[tuple[str, str, str], MusicInput]] = []
+        for music_input in music_inputs:
+            key = (music_input.artist, music_input.album, music_input.title)
+            for unique_inputs in rounds:
+                if key not in unique_inputs:
+                    unique_inputs[key] = music_input
+                    break
+            else:
+                rounds.append({key: music_input})
+
+        musics: list[Music] = []
+        for unique_inputs in rounds:
+            musics.extend(await self.upsert_chunk(list(unique_inputs.values())))
+        return musics
+
+    async def upsert_chunk(self, music_inputs: list[MusicInput]) -> list[Music]:
+        """Upsert unique musics in one round-trip, a chunk failing on a non-retryable error is bisected to isolate bad inputs"""
+        chunk = [{key: value for key, value in asdict(music_input).items() if value is not None} for music_input in music_inputs]
+        if (encoded := self.dumps_json(chunk, option=None)) is None:
+            return []
+        retries = DEFAULT_RETRIES
+        last_error = None
+        start = time.perf_counter()
+        while retries > 0:
+            try:
+                async with self.slot("bulk upsert"):
+                    results = await bulk_upsert_musics(self.client, musics=encoded)
+                self.stats.latencies.append(time.perf_counter() - start)
+                self.success(f"{self} : updated {len(results)} musics")
+                return [Music.from_dict(data) for result in results if (data := self.loads_json(result)) is not None]
+            except gel.errors.TransactionSerializationError as error:
+                retries -= 1
+                self.stats.count("retries")
+                self.warn(f"{self} : transaction error on {len(chunk)} musics, {retries} retries left")
+                last_error = error
+                await self.backoff(DEFAULT_RETRIES - retries)
+            except (gel.errors.QueryError, gel.errors.ExecutionError) as error:
+                # integrity and invalid value errors are execution errors in gel, not query errors
+                if len(music_inputs) == 1:
+                    self.err(f"{music_inputs[0]} : unable to upsert", error=error)
+                    return []
+                self.stats.count("bisections")
+                middle = len(music_inputs) // 2
+                return await self.upsert_chunk(music_inputs[:middle]) + await self.upsert_chunk(music_inputs[middle:])
+            except OSError as error:
+                self.err(f"{self} : unknown error", error=error)
+                return []
+        self.err(f"{self} : too many transaction failures", error=last_error)
+        return []
+
     async def make_bests(
         self,
         music_filters: frozenset[MusicFilter] = frozenset(),
@@ -286,57 +479,19 @@ class MusicDb(MusicbotObject):
         if not music_filters:
             music_filters = frozenset([MusicFilter()])
 
-        results = []
-        for music_filter in music_filters:
-            intermediate_result = await gen_bests(
-                self.client,
-                min_length=music_filter.min_length,
-                max_length=music_filter.max_length,
-                min_size=music_filter.min_size,
-                max_size=music_filter.max_size,
-                min_rating=music_filter.min_rating,
-                max_rating=music_filter.max_rating,
-                artist=music_filter.artist,
-                album=music_filter.album,
-                genre=music_filter.genre,
-                title=music_filter.title,
-                keyword=music_filter.keyword,
-                pattern=music_filter.pattern,
-                limit=music_filter.limit,
-            )
-            results.append(self.loads_json(intermediate_result))
-
-        playlists = []
-        for result in results:
-            for genre in result["genres"]:  # type: ignore[index]
-                genre_name = f"genre_{genre['key']['genre']['name'].lower()}"
-                self.success(f"Genre {genre_name} : {len(genre['elements'])}")
-                print(genre["elements"])
-                playlist = Playlist.from_dict(name=genre_name, data=genre["elements"])
-                playlists.append(playlist)
-            for keyword in result["keywords"]:  # type: ignore[index]
-                keyword_name = f"keyword_{keyword['name'].lower()}"
-                self.success(f"Keyword {keyword_name} : {len(keyword['musics'])}")
-                playlist = Playlist.from_dict(name=keyword_name, data=keyword["musics"])
-                playlists.append(playlist)
-            for rating in result["ratings"]:  # type: ignore[index]
-                rating_name = f"rating_{rating['key']['rating']}"
-                self.success(f"Rating {rating_name} : {len(rating['elements'])}")
-                playlist = Playlist.from_dict(name=rating_name, data=rating["elements"])
-                playlists.append(playlist)
-            for artist in result["keywords_for_artist"]:  # type: ignore[index]
-                artist_name = artist["artist"]
-                for artist_keyword in artist["keywords"]:
-                    keyword_name = artist_keyword["keyword"]
-                    final_artist_keyword = f"{artist_name}{os.sep}keyword_{keyword_name.lower()}"
-                    self.success(f"Keyword by artist {final_artist_keyword} : {len(artist_keyword['musics'])}")
-                    playlist = Playlist.from_dict(name=final_artist_keyword, data=artist_keyword["musics"])
-                    playlists.append(playlist)
-            for ratings_for_artist in result["ratings_for_artist"]:  # type: ignore[index]
-                artist_name = ratings_for_artist["key"]["artist"]["name"]
-                rating_name = str(ratings_for_artist["key"]["rating"])
-                artist_rating = f"{artist_name}{os.sep}rating_{rating_name}"
-                self.success(f"Rating by artist {artist_rating} : {len(ratings_for_artist['elements'])}")
-                playlist = Playlist.from_dict(name=artist_rating, data=ratings_for_artist["elements"])
-                playlists.append(playlist)
+        query, arguments = compile_bests(music_filters)
+        async with self.slot():
+            data = self.loads_json(await self.client.query_single_json(query, **arguments))
+        if not data:
+            self.warn("No bests found")
+            return []
+        try:
+            bests = Bests.from_dict(data)
+        except ValueError as error:
+            self.err("Unable to build bests", error=error)
+            return []
+
+        playlists = bests.playlists
+        for playlist in playlists:
+            self.success(f"{playlist.name} : {len(playlist.musics)}")
         return playlists
@@ -2,6 +2,7 @@ import asyncio
 import concurrent.futures as cf
 import dataclasses
 import io
+import itertools
 import logging
 import os
 import signal
@@ -24,7 +25,12 @@ from rich.console import Console
 from rich.table import Table
 
 from musicbot.config import DEFAULT_QUIET, Config
-from musicbot.defaults import DEFAULT_COROUTINES, DEFAULT_THREADS
+from musicbot.defaults import (
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_COROUTINES,
+    DEFAULT_EXECUTOR,
+    DEFAULT_THREADS,
+)
 from musicbot.one_way_bool import OneWayBool
 
 logger = logging.getLogger(__name__)
@@ -59,6 +65,7 @@ def _public_ip(timeout: int = 5) -> str | None:
 
 @beartype
 class MusicbotObject:
+    __slots__ = ()
     print_lock = threading.Lock()
     is_tty = sys.stderr.isatty()
     console = Console()
@@ -201,14 +208,41 @@ class MusicbotObject:
         desc: str | None = None,
         limit: int | None = None,
         threads: int | None = None,
+        executor: str = DEFAULT_EXECUTOR,
+        chunksize: int = DEFAULT_CHUNKSIZE,
         **kwargs: Any,
     ) -> list[Any]:
-        threads = threads if threads not in (None, 0) else DEFAULT_THREADS
+        """Run worker on items with a thread or a process pool, process workers and their results must be picklable"""
+        if threads in (None, 0):
+            threads = (os.cpu_count() or DEFAULT_THREADS) if executor == "process" else DEFAULT_THREADS
         quiet = len(items) <= 1 or quiet
         results: list[Any] = []
         if desc and (cls.is_dev() or cls.config.info or cls.config.debug):
-            desc += f" ({threads} threads)"
-        if threads == 1:
+            desc += f" ({threads} {'processes' if executor == 'process' else 'threads'})"
+        if executor == "process" and threads > 1:
+            with (
+                cls.progressbar(
+                    max_value=len(items),
+                    quiet=quiet,
+                    redirect_stderr=True,
+                    redirect_stdout=True,
+                    desc=desc,
+                    **kwargs,
+                ) as pbar,
+                cf.ProcessPoolExecutor(max_workers=threads) as process_executor,
+            ):
+                try:
+                    repeated_args = [itertools.repeat(arg) for arg in args]
+                    for result in process_executor.map(worker, items, *repeated_args, chunksize=max(chunksize, 1)):
+                        if result is not None:
+                            results.append(result)
+                        pbar.value += 1
+                        _ = pbar.update()
+                except KeyboardInterrupt:
+                    if cls.is_test():
+                        raise
+                    cls.fast_kill()
+        elif threads == 1:
             with cls.progressbar(
                 max_value=len(items),
                 quiet=quiet,
@@ -236,7 +270,7 @@ class MusicbotObject:
                     desc=desc,
                     **kwargs,
                 ) as pbar,
-                cf.ThreadPoolExecutor(max_workers=threads) as executor,
+                cf.ThreadPoolExecutor(max_workers=threads) as thread_executor,
             ):
                 try:
 
@@ -252,7 +286,7 @@ class MusicbotObject:
 
                     futures = []
                     for item in items:
-                        future = executor.submit(worker, item, *args)
+                        future = thread_executor.submit(worker, item, *args)
                         future.add_done_callback(update_pbar)
                         futures.append(future)
                     _, _ = cf.wait(futures)
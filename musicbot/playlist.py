@@ -1,13 +1,14 @@
 import itertools
 import logging
+import os
 import random
 from codecs import StreamReaderWriter
 from dataclasses import asdict, dataclass
-from pathlib import Path
 
 import click
 import gel
 from beartype import beartype
+from beartype.roar import BeartypeCallHintViolation
 from beartype.typing import Any, Self
 from click_skeleton.helpers import PrettyDefaultDict
 from click_skeleton.helpers import seconds_to_human as formatted_seconds_to_human
@@ -16,11 +17,11 @@ from rich.table import Column, Table
 from rich.text import Text
 
 from musicbot.file import File
-from musicbot.folder import Folder
-from musicbot.helpers import bytes_to_human, precise_seconds_to_human
+from musicbot.helpers import bytes_to_human
 from musicbot.music import Music
 from musicbot.object import MusicbotObject
 from musicbot.playlist_options import PlaylistOptions
+from musicbot.playlist_writers import WRITERS, caption
 
 logger = logging.getLogger(__name__)
 
@@ -54,55 +55,28 @@ class Playlist(MusicbotObject):
         name: str,
         results: list[gel.Object],
     ) -> Self:
-        musics = []
-        for result in results:
-            keywords = frozenset(keyword.name for keyword in result.keywords)
-            folders = frozenset(Folder(path=Path(folder.path), name=folder.name, ipv4=folder.ipv4, username=folder.username) for folder in result.folders)
-            music = Music(
-                title=result.name,
-                artist=result.artist.name,
-                album=result.album.name,
-                genre=result.genre.name,
-                size=result.size,
-                length=result.length,
-                keywords=keywords,
-                track=result.track,
-                rating=result.rating,
-                folders=folders,
-            )
-            musics.append(music)
-
+        musics = [Music.from_gel(result) for result in results]
         return cls(
             name=name,
             musics=musics,
         )
 
-    def print(
-        self,
-        output: str,
+    @staticmethod
+    def table(
+        musics: list[Music],
+        playlist_options: PlaylistOptions,
         current_title: str | None = None,
         current_album: str | None = None,
         current_artist: str | None = None,
-        file: click.utils.LazyFile | StreamReaderWriter | None = None,
-        playlist_options: PlaylistOptions | None = None,
-    ) -> None:
-        playlist_options = playlist_options if playlist_options is not None else PlaylistOptions()
-        musics = self.musics
-        if playlist_options.interleave:
-            musics_by_artist = PrettyDefaultDict(list)
-            for music in self.musics:
-                musics_by_artist[music.artist].append(music)
-            musics = list(interleave_evenly([list(value) for value in musics_by_artist.values()]))
-
-        if playlist_options.shuffle:
-            random.shuffle(musics)
-
+        name: str = "",
+    ) -> Table:
+        """Rich table of musics, only built for the table output"""
         table = Table(
             Column("Music", vertical="middle"),
             Column("Infos", vertical="middle"),
             Column("Links", no_wrap=True),
             show_lines=True,
-            title=f"Playlist: {self.name}",
+            title=f"Playlist: {name}",
         )
         total_length = 0
         total_size = 0
@@ -121,22 +95,41 @@ class Playlist(MusicbotObject):
             total_length += music.length
             total_size += music.size
 
-        caption = f"Songs: {len(musics)} | Total length: {precise_seconds_to_human(total_length)} | Total size: {bytes_to_human(total_size)}"
-        table.caption = caption
+        table.caption = caption(len(musics), total_length, total_size)
+        return table
+
+    def print(
+        self,
+        output: str,
+        current_title: str | None = None,
+        current_album: str | None = None,
+        current_artist: str | None = None,
+        file: click.utils.LazyFile | StreamReaderWriter | None = None,
+        playlist_options: PlaylistOptions | None = None,
+    ) -> None:
+        playlist_options = playlist_options if playlist_options is not None else PlaylistOptions()
+        musics = self.musics
+        if playlist_options.interleave:
+            musics_by_artist = PrettyDefaultDict(list)
+            for music in self.musics:
+                musics_by_artist[music.artist].append(music)
+            musics = list(interleave_evenly([list(value) for value in musics_by_artist.values()]))
+
+        if playlist_options.shuffle:
+            random.shuffle(musics)
 
         if not musics and output != "json":
-            pass
-        elif output == "m3u":
-            p = "#EXTM3U\n"
-            p += "#EXTREM:" + self.name + "\n"
-            p += "\n".join(self.links(playlist_options))
-            print(p, file=file)
-            self.success(caption)
-        elif output == "table":
-            self.print_table(table, file=file)
-        elif output == "json":
+            return
+        if output == "json":
             self.print_json(asdict(self), file=file)
-            self.success(caption)
+            self.success(caption(len(musics), sum(music.length for music in musics), sum(music.size for music in musics)))
+        elif output == "table":
+            self.print_table(self.table(musics, playlist_options, current_title, current_album, current_artist, name=self.name), file=file)
+        elif output in WRITERS:
+            writer = WRITERS[output](name=self.name, file=file, playlist_options=playlist_options)
+            for music in musics:
+                writer.write(music)
+            writer.close()
         else:
             self.err(f"unknown output type : {output}")
 
@@ -169,3 +162,42 @@ class Playlist(MusicbotObject):
 
     def links(self, playlist_options: PlaylistOptions) -> list[str]:
         return list(itertools.chain(*[music.links(playlist_options) for music in self.musics]))
+
+
+@beartype
+@dataclass(frozen=True)
+class Bests:
+    """Decoded bests query, musics are sent once and every group only references their ids"""
+
+    musics: dict[str, Music]
+    groups: dict[str, list[str]]
+
+    @classmethod
+    def from_dict(cls, data: Any) -> Self:
+        """Validate the whole document once, missing keys, wrong types and unknown ids raise a ValueError"""
+        try:
+            musics = {music["id"]: Music.from_dict(music) for music in data["musics"]}
+            groups: dict[str, list[str]] = {}
+            for genre in data["genres"]:
+                groups[f"genre_{genre['name'].lower()}"] = genre["ids"]
+            for keyword in data["keywords"]:
+                groups[f"keyword_{keyword['name'].lower()}"] = keyword["ids"]
+            for rating in data["ratings"]:
+                groups[f"rating_{rating['rating']}"] = rating["ids"]
+            for artist in data["keywords_for_artist"]:
+                for artist_keyword in artist["keywords"]:
+                    groups[f"{artist['artist']}{os.sep}keyword_{artist_keyword['name'].lower()}"] = artist_keyword["ids"]
+            for ratings_for_artist in data["ratings_for_artist"]:
+                groups[f"{ratings_for_artist['artist']}{os.sep}rating_{ratings_for_artist['rating']}"] = ratings_for_artist["ids"]
+            bests = cls(musics=musics, groups=groups)
+        except (KeyError, TypeError, AttributeError, BeartypeCallHintViolation) as error:
+            raise ValueError(f"malformed bests document : {error!r}") from error
+        if unknown := {music_id for ids in groups.values() for music_id in ids} - musics.keys():
+            raise ValueError(f"bests groups reference unknown musics : {sorted(unknown)}")
+        return bests
+
+    @property
+    def playlists(self) -> list[Playlist]:
+        """Groups as playlists, musics keep the order of the query"""
+        positions = {music_id: position for position, music_id in enumerate(self.musics)}
+        return [Playlist(name=name, musics=[self.musics[music_id] for music_id in sorted(ids, key=positions.__getitem__)]) for name, ids in self.groups.items()]
@@ -0,0 +1,197 @@
+import abc
+import contextlib
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import textwrap
+from dataclasses import asdict, dataclass, field
+from functools import cache
+from pathlib import Path
+
+import orjson
+from beartype import beartype
+from beartype.typing import Any
+
+from musicbot.defaults import DEFAULT_PLAYLIST_THREADS
+from musicbot.helpers import bytes_to_human, precise_seconds_to_human
+from musicbot.music import Music
+from musicbot.object import MusicbotObject
+from musicbot.playlist_options import PlaylistOptions
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+def caption(count: int, total_length: int, total_size: int) -> str:
+    return f"Songs: {count} | Total length: {precise_seconds_to_human(total_length)} | Total size: {bytes_to_human(total_size)}"
+
+
+@beartype
+@dataclass
+class PlaylistWriter(MusicbotObject, abc.ABC):
+    """Write musics one by one, only what the output format needs is computed"""
+
+    name: str
+    file: Any = None
+    playlist_options: PlaylistOptions = field(default_factory=PlaylistOptions)
+    count: int = 0
+    total_length: int = 0
+    total_size: int = 0
+
+    def begin(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def entry(self, music: Music) -> None:
+        pass
+
+    def write(self, music: Music) -> None:
+        if not self.count:
+            self.begin()
+        self.entry(music)
+        self.count += 1
+        self.total_length += music.length
+        self.total_size += music.size
+
+    def close(self) -> None:
+        if self.count:
+            self.success(self.caption)
+
+    @property
+    def caption(self) -> str:
+        return caption(self.count, self.total_length, self.total_size)
+
+
+@beartype
+@dataclass
+class M3uWriter(PlaylistWriter):
+    def begin(self) -> None:
+        print(f"#EXTM3U\n#EXTREM:{self.name}", file=self.file)
+
+    def entry(self, music: Music) -> None:
+        if links := music.links(self.playlist_options):
+            print("\n".join(links), file=self.file)
+
+
+@beartype
+@dataclass
+class M3u8Writer(PlaylistWriter):
+    def begin(self) -> None:
+        print(f"#EXTM3U\n#PLAYLIST:{self.name}", file=self.file)
+
+    def entry(self, music: Music) -> None:
+        extinf = f"#EXTINF:{music.length},{music.artist} - {music.title}"
+        for link in music.links(self.playlist_options):
+            print(f"{extinf}\n{link}", file=self.file)
+
+
+@beartype
+@dataclass
+class NdjsonWriter(PlaylistWriter):
+    """One compact json document per music, orjson serializes the dataclass itself without an asdict deep copy"""
+
+    def entry(self, music: Music) -> None:
+        print(self.dumps_json(music, option=orjson.OPT_SORT_KEYS), file=self.file)  # pylint: disable=maybe-no-member
+
+
+@beartype
+@dataclass
+class JsonWriter(PlaylistWriter):
+    """Same document as a printed json playlist, written incrementally, an empty playlist is still a valid document"""
+
+    def begin(self) -> None:
+        print('{\n  "musics": [', file=self.file)
+
+    def entry(self, music: Music) -> None:
+        if self.count:
+            print(",", file=self.file)
+        if (encoded := self.dumps_json(asdict(music))) is not None:
+            print(textwrap.indent(encoded, "    "), end="", file=self.file)
+
+    def close(self) -> None:
+        if not self.count:
+            print('{\n  "musics": [', end="", file=self.file)
+        print(f'\n  ],\n  "name": {self.dumps_json(self.name)}\n}}', file=self.file)
+        self.success(self.caption)
+
+
+WRITERS: dict[str, type[PlaylistWriter]] = {
+    "m3u": M3uWriter,
+    "m3u8": M3u8Writer,
+    "ndjson": NdjsonWriter,
+    "json": JsonWriter,
+}
+
+
+@beartype
+def render(name: str, musics: list[Music], output: str = "m3u", playlist_options: PlaylistOptions | None = None) -> str:
+    buffer = io.StringIO()
+    writer = WRITERS[output](name=name, file=buffer, playlist_options=playlist_options if playlist_options is not None else PlaylistOptions())
+    for music in musics:
+        writer.write(music)
+    writer.close()
+    return buffer.getvalue()
+
+
+@cache
+def default_mode() -> int:
+    """Mode of new playlists, the umask is read from /proc when possible because setting it is process wide"""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("Umask:"):
+                return 0o666 & ~int(line.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0o022)
+    _ = os.umask(umask)
+    return 0o666 & ~umask
+
+
+@beartype
+def write_if_changed(path: Path, content: str, encoding: str = "utf-8-sig") -> Path | None:
+    """Atomically replace a file when its content hash differs, unchanged files keep their mtime for downstream syncs"""
+    data = content.encode(encoding)
+    mode = default_mode()
+    try:
+        stat = path.stat()
+        if stat.st_size == len(data) and hashlib.sha256(path.read_bytes()).digest() == hashlib.sha256(data).digest():
+            return None
+        mode = stat.st_mode & 0o777
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    # temporary files are created owner only, playlists keep the mode of the file they replace
+    temporary = tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False)  # noqa: SIM115 # pylint: disable=consider-using-with
+    try:
+        with temporary:
+            _ = temporary.write(data)
+        os.chmod(temporary.name, mode)
+        os.replace(temporary.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temporary.name)
+        raise
+    return path
+
+
+@beartype
+def write_playlists(contents: dict[Path, str], threads: int = DEFAULT_PLAYLIST_THREADS, encoding: str = "utf-8-sig") -> list[Path]:
+    """Write changed playlists with a small thread pool, returns the rewritten paths"""
+    # the mode of new playlists is read before threads are started
+    _ = default_mode()
+
+    def worker(item: tuple[Path, str]) -> Path | None:
+        path, content = item
+        if MusicbotObject.dry:
+            if path.exists() and path.read_text(encoding=encoding) == content:
+                return None
+            MusicbotObject.success(f"DRY RUN: Writing playlist {path}")
+            return path
+        try:
+            return write_if_changed(path, content, encoding=encoding)
+        except (OSError, LookupError, ValueError, UnicodeError) as e:
+            logger.warning(f"Unable to write playlist {path} because of {e}")
+        return None
+
+    return MusicbotObject.parallel_gather(worker, list(contents.items()), threads=min(threads, max(len(contents), 1)), desc="Writing playlists")
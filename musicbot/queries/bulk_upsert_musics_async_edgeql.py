@@ -0,0 +1,140 @@
+# AUTOGENERATED FROM 'musicbot/queries/bulk_upsert_musics.edgeql' WITH:
+#     $ gel-py --dir musicbot/queries -I musicbot-test
+
+
+from __future__ import annotations
+
+import gel
+
+
+async def bulk_upsert_musics(
+    executor: gel.AsyncIOExecutor,
+    *,
+    musics: str,
+) -> list[str]:
+    return await executor.query(
+        """\
+        with
+            musics := json_array_unpack(<json>$musics),
+            upserted_artists := (
+                for artist in distinct <str>musics['artist']
+                union (
+                    insert Artist {
+                        name := artist
+                    }
+                    unless conflict on (.name) else (select Artist)
+                )
+            ),
+            upserted_albums := (
+                for album in distinct (<str>musics['artist'], <str>musics['album'])
+                union (
+                    insert Album {
+                        name := album.1,
+                        artist := assert_exists(assert_single((select upserted_artists filter .name = album.0)))
+                    }
+                    unless conflict on (.name, .artist) else (select Album)
+                )
+            ),
+            upserted_genres := (
+                for genre in distinct <str>musics['genre']
+                union (
+                    insert Genre {
+                        name := genre
+                    }
+                    unless conflict on (.name) else (select Genre)
+                )
+            ),
+            upserted_keywords := (
+                for keyword in distinct <str>json_array_unpack(musics['keywords'])
+                union (
+                    insert Keyword {
+                        name := keyword
+                    }
+                    unless conflict on (.name) else (select Keyword)
+                )
+            ),
+            upserted_folders := (
+                for folder in distinct (<str>musics['folder'], <str>musics['username'], <str>musics['ipv4'])
+                union (
+                    insert Folder {
+                        name := folder.0,
+                        username := folder.1,
+                        ipv4 := folder.2
+                    }
+                    unless conflict on (.name, .username, .ipv4) else (select Folder)
+                )
+            ),
+            upserted_musics := (
+                for music in musics
+                union (
+                    with
+                        album := assert_exists(assert_single((
+                            select upserted_albums
+                            filter .name = <str>music['album'] and .artist.name = <str>music['artist']
+                        ))),
+                        genre := assert_exists(assert_single((select upserted_genres filter .name = <str>music['genre']))),
+                        keywords := (select upserted_keywords filter .name in <str>json_array_unpack(music['keywords'])),
+                        folder := assert_exists(assert_single((
+                            select upserted_folders
+                            filter .name = <str>music['folder'] and .username = <str>music['username'] and .ipv4 = <str>music['ipv4']
+                        ))),
+                        track := <Track><int64>json_get(music, 'track'),
+                        mtime := <int64>json_get(music, 'mtime')
+                    select (
+                        insert Music {
+                            name := <str>music['title'],
+                            size := <Size><int64>music['size'],
+                            length := <Length><int64>music['length'],
+                            genre := genre,
+                            album := album,
+                            keywords := keywords,
+                            track := track,
+                            rating := <Rating><float64>music['rating'],
+                            folders := (
+                                select folder {
+                                    @path := <str>music['path'],
+                                    @mtime := mtime
+                                }
+                            )
+                        }
+                        unless conflict on (.name, .album) else (
+                            update Music
+                            set {
+                                size := <Size><int64>music['size'],
+                                genre := genre,
+                                album := album,
+                                keywords := keywords,
+                                length := <Length><int64>music['length'],
+                                track := track,
+                                rating := <Rating><float64>music['rating'],
+                                folders += (
+                                    select folder {
+                                        @path := <str>music['path'],
+                                        @mtime := mtime
+                                    }
+                                )
+                            }
+                        )
+                    )
+                )
+            )
+        select <json>(upserted_musics {
+            name,
+            size,
+            genre: {name},
+            album: {name},
+            artist: {name},
+            keywords: {name},
+            length,
+            track,
+            rating,
+            folders: {
+                name,
+                ipv4,
+                username,
+                path := @path
+            } filter exists @path
+        })\
+        """,
+        musics=musics,
+    )
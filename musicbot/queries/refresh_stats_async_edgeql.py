@@ -0,0 +1,102 @@
+# AUTOGENERATED FROM 'musicbot/queries/refresh_stats.edgeql' WITH:
+#     $ gel-py --dir musicbot/queries -I musicbot-test
+
+
+from __future__ import annotations
+
+import dataclasses
+
+import gel
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class RefreshStatsResult(NoPydanticValidation):
+    folders_refreshed: int
+    artists_refreshed: int
+    albums_refreshed: int
+    genres_refreshed: int
+    keywords_refreshed: int
+
+
+async def refresh_stats(
+    executor: gel.AsyncIOExecutor,
+) -> RefreshStatsResult:
+    return await executor.query_single(
+        """\
+        with
+            folders := (update Folder set {
+                n_musics := count(.musics),
+                length := sum(.musics.length),
+                size := sum(.musics.size),
+                n_keywords := count(.keywords),
+                all_keywords := to_str(array_agg((select Folder.keywords.name order by Folder.keywords.name)), " "),
+                n_artists := count(.artists),
+                all_artists := to_str(array_agg((select Folder.artists.name order by Folder.artists.name)), " "),
+                n_albums := count(.albums),
+                n_genres := count(.genres),
+                all_genres := to_str(array_agg((select Folder.genres.name order by Folder.genres.name)), " "),
+            }),
+            artists := (update Artist set {
+                n_albums := count(.albums),
+                n_musics := count(.musics),
+                length := sum(.musics.length),
+                rating := <float64>round(<decimal>math::mean(.musics.rating ?? {0.0}), 2),
+                all_genres := to_str(array_agg((select Artist.genres.name order by Artist.genres.name)), " "),
+                all_keywords := to_str(array_agg((select Artist.keywords.name order by Artist.keywords.name)), " "),
+                n_genres := count(.genres),
+                size := sum(.musics.size),
+            }),
+            albums := (update Album set {
+                n_musics := count(.musics),
+                rating := <float64>round(<decimal>math::mean(.musics.rating ?? {0.0}), 2),
+                length := sum(.musics.length),
+                size := sum(.musics.size),
+                all_keywords := to_str(array_agg((select Album.keywords.name order by Album.keywords.name)), " "),
+                n_genres := count(.genres),
+                all_genres := to_str(array_agg((select Album.genres.name order by Album.genres.name)), " "),
+            }),
+            genres := (update Genre set {
+                n_musics := count(.musics),
+                rating := <float64>round(<decimal>math::mean(.musics.rating ?? {0.0}), 2),
+                n_artists := count(.artists),
+                all_artists := to_str(array_agg((select Genre.artists.name order by Genre.artists.name)), " "),
+                n_albums := count(.albums),
+                length := sum(.musics.length),
+                size := sum(.musics.size),
+            }),
+            keywords := (update Keyword set {
+                n_musics := count(.musics),
+                length := sum(.musics.length),
+                rating := <float64>round(<decimal>math::mean(.musics.rating ?? {0.0}), 2),
+                n_artists := count(.artists),
+                all_artists := to_str(array_agg((select Keyword.artists.name order by Keyword.artists.name)), " "),
+                n_albums := count(.albums),
+                size := sum(.musics.size),
+            })
+        select {
+            folders_refreshed := count(folders),
+            artists_refreshed := count(artists),
+            albums_refreshed := count(albums),
+            genres_refreshed := count(genres),
+            keywords_refreshed := count(keywords)
+        };\
+        """,
+    )
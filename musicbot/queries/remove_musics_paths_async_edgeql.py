@@ -0,0 +1,49 @@
+# AUTOGENERATED FROM 'musicbot/queries/remove_musics_paths.edgeql' WITH:
+#     $ gel-py --dir musicbot/queries -I musicbot-test
+
+
+from __future__ import annotations
+
+import dataclasses
+import uuid
+
+import gel
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class RemoveMusicsPathsResult(NoPydanticValidation):
+    id: uuid.UUID
+
+
+async def remove_musics_paths(
+    executor: gel.AsyncIOExecutor,
+    *,
+    paths: list[str],
+) -> list[RemoveMusicsPathsResult]:
+    return await executor.query(
+        """\
+        with paths := array_unpack(<array<str>>$paths)
+        update Music
+        filter .folders@path in paths
+        set {folders := (select .folders filter @path not in paths)}\
+        """,
+        paths=paths,
+    )
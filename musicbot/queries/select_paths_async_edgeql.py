@@ -0,0 +1,67 @@
+# AUTOGENERATED FROM 'musicbot/queries/select_paths.edgeql' WITH:
+#     $ gel-py --dir musicbot/queries -I musicbot-test
+
+
+from __future__ import annotations
+
+import dataclasses
+import uuid
+
+import gel
+
+Size = int
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class SelectPathsResult(NoPydanticValidation):
+    id: uuid.UUID
+    size: Size
+    folders: list[SelectPathsResultFoldersItem]
+
+
+@dataclasses.dataclass
+class SelectPathsResultFoldersItem(NoPydanticValidation):
+    id: uuid.UUID
+    name: str
+    path: str | None
+    mtime: int | None
+
+
+async def select_paths(
+    executor: gel.AsyncIOExecutor,
+    *,
+    folders: list[str],
+) -> list[SelectPathsResult]:
+    return await executor.query(
+        """\
+        with folder_names := array_unpack(<array<str>>$folders)
+        select Music {
+            size,
+            folders: {
+                name,
+                path := @path,
+                mtime := @mtime
+            } filter .name in folder_names
+        }
+        filter .folders.name in folder_names\
+        """,
+        folders=folders,
+    )
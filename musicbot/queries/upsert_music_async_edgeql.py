@@ -98,6 +98,7 @@ async def upsert_music(
     rating: Rating02,
     folder: uuid.UUID,
     path: str,
+    mtime: int | None = None,
 ) -> UpsertMusicResult:
     return await executor.query_single(
         """\
@@ -111,7 +112,8 @@ async def upsert_music(
             track := <optional Track>$track,
             rating := <Rating>$rating,
             folder := <Folder>$folder,
-            path := <str>$path
+            path := <str>$path,
+            mtime := <optional int64>$mtime
         ){
             name,
             size,
@@ -173,4 +175,5 @@ async def upsert_music(
         rating=rating,
         folder=folder,
         path=path,
+        mtime=mtime,
     )
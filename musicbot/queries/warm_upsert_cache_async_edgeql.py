@@ -0,0 +1,87 @@
+# AUTOGENERATED FROM 'musicbot/queries/warm_upsert_cache.edgeql' WITH:
+#     $ gel-py --dir musicbot/queries -I musicbot-test
+
+
+from __future__ import annotations
+
+import dataclasses
+import uuid
+
+import gel
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class WarmUpsertCacheResult(NoPydanticValidation):
+    artists: list[WarmUpsertCacheResultArtistsItem]
+    genres: list[WarmUpsertCacheResultGenresItem]
+    keywords: list[WarmUpsertCacheResultKeywordsItem]
+    folders: list[WarmUpsertCacheResultFoldersItem]
+
+
+@dataclasses.dataclass
+class WarmUpsertCacheResultArtistsItem(NoPydanticValidation):
+    id: uuid.UUID
+    name: str
+    albums: list[WarmUpsertCacheResultArtistsItemAlbumsItem]
+
+
+@dataclasses.dataclass
+class WarmUpsertCacheResultArtistsItemAlbumsItem(NoPydanticValidation):
+    id: uuid.UUID
+    name: str
+
+
+@dataclasses.dataclass
+class WarmUpsertCacheResultFoldersItem(NoPydanticValidation):
+    id: uuid.UUID
+    name: str
+
+
+@dataclasses.dataclass
+class WarmUpsertCacheResultGenresItem(NoPydanticValidation):
+    id: uuid.UUID
+    name: str
+
+
+@dataclasses.dataclass
+class WarmUpsertCacheResultKeywordsItem(NoPydanticValidation):
+    id: uuid.UUID
+    name: str
+
+
+async def warm_upsert_cache(
+    executor: gel.AsyncIOExecutor,
+    *,
+    username: str,
+    ipv4: str,
+) -> WarmUpsertCacheResult:
+    return await executor.query_single(
+        """\
+        select {
+            artists := (select Artist { name, albums: { name } }),
+            genres := (select Genre { name }),
+            keywords := (select Keyword { name }),
+            folders := (select Folder { name } filter .username = <str>$username and .ipv4 = <str>$ipv4)
+        }\
+        """,
+        username=username,
+        ipv4=ipv4,
+    )
@@ -1,25 +1,73 @@
 import asyncio
+import concurrent.futures as cf
 import logging
 import os
+import zlib
+from contextlib import closing
 from dataclasses import dataclass
 from functools import cached_property
 from itertools import islice
 from pathlib import Path
 
 from beartype import beartype
-from beartype.typing import Any, Callable, Iterator
+from beartype.typing import Any, Callable, Generator, Iterator
 from natsort import os_sorted
+from progressbar import NullBar, ProgressBar, UnknownLength
 from yaspin import yaspin
 
-from musicbot.defaults import DEFAULT_EXTENSIONS, EXCEPT_DIRECTORIES
-from musicbot.file import File, Issue
-from musicbot.music import Music
+from musicbot.defaults import (
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_EXECUTOR,
+    DEFAULT_EXTENSIONS,
+    DEFAULT_THREADS,
+    DEFAULT_UPSERT_CHUNK,
+    EXCEPT_DIRECTORIES,
+)
+from musicbot.file import File
+from musicbot.music import Music, MusicInput
 from musicbot.musicdb import MusicDb
 from musicbot.object import MusicbotObject
+from musicbot.scan_stats import ScanStats
+from musicbot.tag_cache import TagCache
+from musicbot.tag_snapshot import TagSnapshot
 
 logger = logging.getLogger(__name__)
 
 
+@beartype
+def load_file(folder_and_path: tuple[Path, Path]) -> File | None:
+    try:
+        folder, path = folder_and_path
+        return File.from_path(folder=folder, path=path)
+    except OSError as e:
+        logger.error(e)
+    return None
+
+
+@beartype
+def normalize_path(path: str | Path) -> str:
+    """Stored and walked paths are compared resolved, so a library reached through a symlink keeps the same keys"""
+    return str(Path(path).resolve())
+
+
+@beartype
+def load_tags(folder_and_path: tuple[Path, Path]) -> TagSnapshot | None:
+    if (file := load_file(folder_and_path)) is None:
+        return None
+    return file.snapshot
+
+
+@beartype
+def convert_to_mp3(folder_and_path: tuple[Path, Path], destination: Path, flat: bool) -> File | None:
+    folder, path = folder_and_path
+    try:
+        if file := File.from_path(folder=folder, path=path):
+            return file.to_mp3(flat=flat, destination=destination)
+    except Exception as error:
+        MusicbotObject.err(f"{path} : unable to convert to mp3", error=error)
+    return None
+
+
 @beartype
 @dataclass(unsafe_hash=True)
 class ScanFolders(MusicbotObject):
@@ -27,14 +75,20 @@ class ScanFolders(MusicbotObject):
     extensions: frozenset[str] = DEFAULT_EXTENSIONS
     except_directories: frozenset[str] = EXCEPT_DIRECTORIES
     limit: int | None = None
+    tag_cache_path: Path | None = None
+    executor: str = DEFAULT_EXECUTOR
+    chunksize: int = DEFAULT_CHUNKSIZE
 
     def __post_init__(self) -> None:
         self.directories = [directory.resolve() for directory in self.directories]
 
-    def apply(self, worker: Callable, **kwargs: Any) -> Any:
+    def apply(self, worker: Callable, *args: Any, **kwargs: Any) -> Any:
         return self.parallel_gather(
             worker,
             list(self.folders_and_paths),
+            *args,
+            executor=self.executor,
+            chunksize=self.chunksize,
             **kwargs,
         )
 
@@ -44,36 +98,134 @@ class ScanFolders(MusicbotObject):
 
     @cached_property
     def files(self) -> list[File]:
-        def worker(folder_and_path: tuple[Path, Path]) -> File | None:
-            try:
-                folder, path = folder_and_path
-                return File.from_path(folder=folder, path=path)
-            except OSError as e:
-                logger.error(e)
+        return list(os_sorted(self.apply(load_file, desc="Loading musics"), lambda f: f.path))[: self.limit]
+
+    @cached_property
+    def tag_cache(self) -> TagCache | None:
+        if self.tag_cache_path is None:
+            return None
+        return TagCache.load(self.tag_cache_path)
+
+    def lookup(
+        self,
+        folder: Path,
+        path: Path,
+        known_paths: dict[str, tuple[int, int | None]] | None = None,
+    ) -> tuple[os.stat_result, TagSnapshot | None] | None:
+        """Stat a file, skip it when its size and mtime match known paths (keyed by normalized path), or fetch its tags from cache"""
+        try:
+            stat = path.stat()
+        except OSError as e:
+            logger.error(e)
+            return None
+        if known_paths and known_paths.get(normalize_path(path)) == (stat.st_size, stat.st_mtime_ns):
             return None
+        if (tag_cache := self.tag_cache) is not None:
+            return stat, tag_cache.get(folder=folder, path=path, stat=stat)
+        return stat, None
+
+    def remember(self, snapshot: TagSnapshot, stat: os.stat_result) -> None:
+        if (tag_cache := self.tag_cache) is not None:
+            tag_cache.add(snapshot=snapshot, stat=stat)
+
+    def save_tag_cache(self, paths: set[Path]) -> None:
+        if (tag_cache := self.tag_cache) is None:
+            return
+        if self.limit is None:
+            tag_cache.prune(directories=self.directories, paths=paths)
+        tag_cache.save()
+        self.success(f"{self} : tags cache {tag_cache.hits} hits, {tag_cache.misses} misses")
 
-        return list(os_sorted(self.apply(worker, desc="Loading musics"), lambda f: f.path))[: self.limit]
+    def load_snapshots(
+        self,
+        folders_and_paths: set[tuple[Path, Path]],
+        known_paths: dict[str, tuple[int, int | None]] | None = None,
+    ) -> list[TagSnapshot]:
+        """Load tags of files, skipping those whose size and mtime match known paths"""
+        _ = self.tag_cache
+
+        def worker(folder_and_path: tuple[Path, Path]) -> tuple[tuple[Path, Path], tuple[os.stat_result, TagSnapshot | None] | None]:
+            folder, path = folder_and_path
+            return folder_and_path, self.lookup(folder=folder, path=path, known_paths=known_paths)
+
+        snapshots = []
+        pending = {}
+        for folder_and_path, looked_up in self.parallel_gather(worker, list(folders_and_paths), quiet=True):
+            if looked_up is None:
+                continue
+            stat, snapshot = looked_up
+            if snapshot is None:
+                pending[folder_and_path] = stat
+            else:
+                snapshots.append(snapshot)
+
+        for snapshot in self.parallel_gather(load_tags, list(pending), desc="Loading musics", executor=self.executor, chunksize=self.chunksize):
+            if (stat := pending.get((snapshot.folder, snapshot.path))) is not None:
+                self.remember(snapshot=snapshot, stat=stat)
+            snapshots.append(snapshot)
+
+        snapshots = list(os_sorted(snapshots, lambda s: s.path))[: self.limit]
+        self.save_tag_cache(paths={path for _, path in folders_and_paths})
+        return snapshots
+
+    @cached_property
+    def snapshots(self) -> list[TagSnapshot]:
+        return self.load_snapshots(self.folders_and_paths)
 
     @cached_property
     def musics(self) -> list[Music]:
-        return [file.music for file in self.files if file.music is not None]
+        return [snapshot.music for snapshot in self.snapshots if snapshot.music is not None]
+
+    def walk(self) -> Generator[tuple[Path, Path], None, None]:
+        """Concurrently walk directories, yielding (folder, path) of music files as soon as they are discovered"""
+        extensions = tuple(self.extensions)
+
+        def scan_directory(folder: Path, directory: str) -> tuple[Path, list[str], list[str]]:
+            files = []
+            subdirectories = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.except_directories:
+                                subdirectories.append(entry.path)
+                        elif entry.name.endswith(extensions):
+                            files.append(entry.path)
+            except OSError as e:
+                logger.error(e)
+            return folder, files, subdirectories
+
+        executor = cf.ThreadPoolExecutor(max_workers=DEFAULT_THREADS)
+        try:
+            futures = {executor.submit(scan_directory, folder, str(folder)) for folder in self.directories}
+            while futures:
+                done, futures = cf.wait(futures, return_when=cf.FIRST_COMPLETED)
+                for future in done:
+                    folder, files, subdirectories = future.result()
+                    for subdirectory in subdirectories:
+                        futures.add(executor.submit(scan_directory, folder, subdirectory))
+                    for file in files:
+                        yield folder, Path(file)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def limited_walk(self) -> Generator[tuple[Path, Path], None, None]:
+        """Walked files, a limit keeps the first files in natural order so that limited scans are reproducible"""
+        with closing(self.walk()) as walk:
+            if self.limit is None:
+                yield from walk
+            else:
+                yield from os_sorted(walk, key=lambda folder_and_path: folder_and_path[1])[: self.limit]
 
     @cached_property
     def folders_and_paths(self) -> set[tuple[Path, Path]]:
         _files = set()
-        n = 0
-        with yaspin(text=f"Loading {n} files", color="yellow") as spinner:
-            for folder in self.directories:
-                for root, _, basenames in os.walk(folder):
-                    if any(e in root for e in self.except_directories):
-                        continue
-                    for basename in basenames:
-                        path = Path(folder) / root / basename
-                        if basename.endswith(tuple(self.extensions)):
-                            _files.add((folder, path))
-                            n += 1
-                            spinner.text = f"Loading {n} files"
-        return set(islice(_files, self.limit))
+        with yaspin(text="Loading 0 files", color="yellow") as spinner, closing(self.limited_walk()) as walk:
+            for folder_and_path in walk:
+                _files.add(folder_and_path)
+                if len(_files) % 1000 == 0:
+                    spinner.text = f"Loading {len(_files)} files"
+        return _files
 
     @cached_property
     def paths(self) -> set[Path]:
@@ -82,6 +234,11 @@ class ScanFolders(MusicbotObject):
     def __repr__(self) -> str:
         return " ".join(str(folder) for folder in self.directories)
 
+    def parse_executor(self, workers: int) -> cf.Executor:
+        if self.executor == "process":
+            return cf.ProcessPoolExecutor(max_workers=workers)
+        return cf.ThreadPoolExecutor(max_workers=workers)
+
     def flush_empty_directories(self, recursive: bool = True) -> Iterator[str]:
         for root_dir in self.directories:
             dirs_list = []
@@ -105,63 +262,159 @@ class ScanFolders(MusicbotObject):
         threads: int,
         flat: bool,
     ) -> list[File]:
-        def worker(folder_and_path: tuple[Path, Path]) -> File | None:
-            folder, path = folder_and_path
-            try:
-                if file := File.from_path(folder=folder, path=path):
-                    return file.to_mp3(flat=flat, destination=destination)
-            except Exception as error:
-                self.err(f"{path} : unable to convert to mp3", error=error)
-            return None
-
         return self.apply(
-            worker,
+            convert_to_mp3,
+            destination,
+            flat,
             desc="Converting flac to mp3",
             threads=threads,
         )
 
-    def flush_m3u(self) -> None:
+    def flush_m3u(self, keep: frozenset[Path] = frozenset(), patterns: tuple[str, ...] = ("*.m3u",)) -> None:
+        """Remove m3u playlists matching patterns in directories, except the ones to keep"""
+        keep = frozenset(path.resolve() for path in keep)
         for directory in self.directories:
-            for filename in directory.glob("*.m3u"):
+            for filename in {filename for pattern in patterns for filename in directory.glob(pattern)}:
+                if filename in keep:
+                    continue
                 if self.dry:
                     self.success(f"{self} : removing {filename}")
                 else:
                     filename.unlink()
 
-    async def scan(self, musicdb: MusicDb) -> list[Music]:
-        max_value = len(self.folders_and_paths)
-        if not max_value:
-            self.warn(f"No music folder or paths discovered from directories {self.directories}")
-            return []
+    async def scan(
+        self,
+        musicdb: MusicDb,
+        incremental: bool = False,
+        collect: bool = True,
+        threads: int | None = None,
+    ) -> list[Music]:
+        """Stream files from the walker to parsing workers then to upsert coroutines sending chunks of musics, through bounded queues"""
+        if not threads:
+            threads = (os.cpu_count() or DEFAULT_THREADS) if self.executor == "process" else DEFAULT_THREADS
+        stats = musicdb.stats = ScanStats()
+        known_paths: dict[str, tuple[int, int | None]] = {}
+        stored_paths: dict[str, str] = {}
+        if incremental:
+            for stored_path, known in (await musicdb.known_paths([str(directory) for directory in self.directories])).items():
+                normalized = normalize_path(stored_path)
+                known_paths[normalized] = known
+                stored_paths[normalized] = stored_path
+
+        _ = self.tag_cache
+        loop = asyncio.get_running_loop()
+        # musics are partitioned by artist, so that concurrent chunks do not write the same artist and album rows
+        upserters = max(min(self.coroutines, DEFAULT_THREADS), 1)
+        paths_queue: asyncio.Queue[tuple[Path, Path] | None] = asyncio.Queue(maxsize=threads * 4)
+        snapshots_queues: list[asyncio.Queue[TagSnapshot | None]] = [asyncio.Queue(maxsize=DEFAULT_UPSERT_CHUNK) for _ in range(upserters)]
+        seen_paths: set[Path] = set()
+        music_outputs: list[Music] = []
+        parsed = 0
+        failed = 0
+
+        async def walk_worker() -> None:
+            with closing(self.limited_walk()) as walk:
+                while True:
+                    with stats.timer("walk"):
+                        if not (batch := await loop.run_in_executor(None, lambda: list(islice(walk, 64)))):
+                            break
+                    stats.count("files", len(batch))
+                    for folder_and_path in batch:
+                        seen_paths.add(folder_and_path[1])
+                        await paths_queue.put(folder_and_path)
+            for _ in range(threads):
+                await paths_queue.put(None)
 
-        failed_inputs = []
-        music_outputs = []
-        files = self.files
-        with self.progressbar(desc="Upserting musics", max_value=max_value) as pbar:
-
-            async def upsert_worker(file: File) -> None:
-                try:
-                    issues = file.issues
-                    if Issue.NO_TITLE in issues or Issue.NO_ARTIST in issues or Issue.NO_ALBUM in issues:
-                        self.warn(f"{file} : missing mandatory fields title/album/artist : {issues}")
-                        return
-                    if (music_input := file.music_input) is None:
-                        self.err(f"{file} : cannot upsert music without physical folder !")
-                        return
-
-                    if (music_output := await musicdb.upsert_music(music_input)) is None:
-                        self.err(f"{music_input} : unable to insert")
-                        failed_inputs.append(file.music_input)
-                    else:
-                        music_outputs.append(music_output)
-                finally:
-                    pbar.value += 1
-                    _ = pbar.update()
+        async def parse_worker(executor: cf.Executor) -> None:
+            nonlocal parsed
+            while (folder_and_path := await paths_queue.get()) is not None:
+                folder, path = folder_and_path
+                with stats.timer("lookup"):
+                    looked_up = await loop.run_in_executor(None, self.lookup, folder, path, known_paths)
+                if looked_up is None:
+                    stats.count("unchanged")
+                    continue
+                stat, snapshot = looked_up
+                if snapshot is None:
+                    with stats.timer("parse"):
+                        snapshot = await loop.run_in_executor(executor, load_tags, folder_and_path)
+                    if snapshot is None:
+                        stats.count("unreadable")
+                        continue
+                    self.remember(snapshot=snapshot, stat=stat)
+                parsed += 1
+                await snapshots_queues[zlib.crc32(snapshot.artist.encode()) % upserters].put(snapshot)
 
+        async def next_chunk(snapshots_queue: asyncio.Queue[TagSnapshot | None]) -> tuple[list[TagSnapshot], bool]:
+            """Wait for a snapshot then take the already queued ones, also tells if the end sentinel was reached"""
+            snapshots: list[TagSnapshot] = []
+            snapshot = await snapshots_queue.get()
+            while snapshot is not None:
+                snapshots.append(snapshot)
+                if len(snapshots) >= DEFAULT_UPSERT_CHUNK or snapshots_queue.empty():
+                    return snapshots, False
+                snapshot = snapshots_queue.get_nowait()
+            return snapshots, True
+
+        async def upsert_worker(snapshots_queue: asyncio.Queue[TagSnapshot | None], pbar: NullBar | ProgressBar) -> None:
+            nonlocal failed
+            finished = False
+            while not finished:
+                snapshots, finished = await next_chunk(snapshots_queue)
+                music_inputs: list[MusicInput] = []
+                for snapshot in snapshots:
+                    if not snapshot.title or not snapshot.artist or not snapshot.album:
+                        self.warn(f"{snapshot} : missing mandatory fields title/album/artist")
+                        continue
+                    with stats.timer("music_input"):
+                        music_input = snapshot.music_input
+                    if music_input is None:
+                        self.err(f"{snapshot} : cannot upsert music without physical folder !")
+                        continue
+                    music_inputs.append(music_input)
+
+                if music_inputs:
+                    with stats.timer("upsert"):
+                        outputs = await musicdb.upsert_musics(music_inputs)
+                    stats.count("upserted", len(outputs))
+                    if not self.dry:
+                        failed += len(music_inputs) - len(outputs)
+                    if collect:
+                        music_outputs.extend(outputs)
+                pbar.value += len(snapshots)
+                _ = pbar.update()
+
+        with (
+            self.parse_executor(threads) as executor,
+            self.progressbar(desc="Upserting musics", max_value=UnknownLength) as pbar,
+        ):
             async with asyncio.TaskGroup() as tg:
-                for file in files:
-                    _ = tg.create_task(upsert_worker(file))
+                for snapshots_queue in snapshots_queues:
+                    _ = tg.create_task(upsert_worker(snapshots_queue, pbar))
+                async with asyncio.TaskGroup() as producers:
+                    _ = producers.create_task(walk_worker())
+                    for _ in range(threads):
+                        _ = producers.create_task(parse_worker(executor))
+                for snapshots_queue in snapshots_queues:
+                    await snapshots_queue.put(None)
+
+        stats.count("parsed", parsed)
+        self.save_tag_cache(paths=seen_paths)
+        if (tag_cache := self.tag_cache) is not None:
+            stats.count("tags cache hits", tag_cache.hits)
+            stats.count("tags cache misses", tag_cache.misses)
+        if not seen_paths and not known_paths:
+            self.warn(f"No music folder or paths discovered from directories {self.directories}")
+            return []
+
+        if incremental:
+            vanished_paths = set()
+            if self.limit is None:
+                vanished_paths = {stored_paths[path] for path in set(known_paths) - {normalize_path(path) for path in seen_paths}}
+            _ = await musicdb.remove_music_paths(sorted(vanished_paths))
+            self.success(f"{self} : {parsed} new or modified files, {len(vanished_paths)} vanished files")
 
-        if failed_inputs:
-            self.warn(f"Unable to insert {len(failed_inputs)} files")
+        if failed:
+            stats.count("failed", failed)
+            self.warn(f"Unable to insert {failed} files")
         return music_outputs
@@ -0,0 +1,81 @@
+import logging
+import statistics
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from beartype import beartype
+from beartype.typing import IO, Any, Iterator
+from rich.table import Table
+
+from musicbot.object import MusicbotObject
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+@dataclass
+class ScanStats(MusicbotObject):
+    """Per-stage timers and counters, stage timers are summed over concurrent workers"""
+
+    started: float = field(default_factory=time.perf_counter)
+    timers: dict[str, float] = field(default_factory=dict)
+    counters: Counter[str] = field(default_factory=Counter)
+    latencies: list[float] = field(default_factory=list)
+    gauges: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[stage] = self.timers.get(stage, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def cache(self, dictionary: str, hit: bool) -> None:
+        self.count(f"{dictionary} cache {'hits' if hit else 'misses'}")
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def percentiles(self) -> dict[str, float]:
+        """Upsert latency percentiles, in seconds"""
+        if len(self.latencies) < 2:
+            return {f"p{p}": latency for p in (50, 95, 99) for latency in self.latencies}
+        quantiles = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return {f"p{p}": quantiles[p - 1] for p in (50, 95, 99)}
+
+    def to_dict(self) -> dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "elapsed": elapsed,
+            "files_per_second": self.counters["files"] / elapsed if elapsed else 0.0,
+            "timers": dict(sorted(self.timers.items())),
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(self.gauges.items())),
+            "upsert_latency": self.percentiles,
+        }
+
+    def print(self, output: str, file: IO | None = None) -> None:
+        data = self.to_dict()
+        if output == "json":
+            self.print_json(data, file=file)
+            return
+        table = Table("Stat", "Value", title="Scan statistics")
+        table.add_row("elapsed", f"{data['elapsed']:.3f}s")
+        table.add_row("files/sec", f"{data['files_per_second']:.1f}")
+        for stage, seconds in data["timers"].items():
+            table.add_row(f"{stage} time", f"{seconds:.3f}s")
+        for name, value in data["counters"].items():
+            table.add_row(name, str(value))
+        for name, value in data["gauges"].items():
+            table.add_row(name, str(value))
+        for percentile, seconds in data["upsert_latency"].items():
+            table.add_row(f"upsert {percentile}", f"{seconds * 1000:.1f}ms")
+        self.print_table(table, file=file)
@@ -0,0 +1,80 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from beartype import beartype
+from beartype.typing import Any, Self
+
+from musicbot.object import MusicbotObject
+from musicbot.tag_snapshot import TagSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+@beartype
+def stat_key(stat: os.stat_result) -> list[int]:
+    """Identify a file version, any change invalidates cached tags"""
+    return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+@beartype
+@dataclass
+class TagCache(MusicbotObject):
+    """Persistent tags snapshots, keyed by path and stat key"""
+
+    path: Path
+    entries: dict[str, dict[str, Any]] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> Self:
+        path = path.expanduser()
+        entries: dict[str, dict[str, Any]] = {}
+        try:
+            if (data := cls.loads_json(path.read_bytes())) is not None:
+                entries = data
+        except FileNotFoundError:
+            logger.info(f"{path} : no tags cache yet")
+        except OSError as error:
+            cls.warn(f"{path} : unable to read tags cache : {error}")
+        return cls(path=path, entries=entries)
+
+    def get(self, folder: Path, path: Path, stat: os.stat_result) -> TagSnapshot | None:
+        entry = self.entries.get(str(path))
+        with self.lock:
+            if entry is None or entry["key"] != stat_key(stat):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return TagSnapshot.from_dict(folder=folder, path=path, data=entry["tags"])
+
+    def add(self, snapshot: TagSnapshot, stat: os.stat_result) -> None:
+        self.entries[str(snapshot.path)] = {
+            "key": stat_key(stat),
+            "tags": snapshot.to_dict(),
+        }
+
+    def prune(self, directories: list[Path], paths: set[Path]) -> None:
+        """Forget entries under directories which are not part of paths anymore"""
+        prefixes = tuple(str(directory) for directory in directories)
+        keep = {str(path) for path in paths}
+        for entry_path in list(self.entries):
+            if entry_path.startswith(prefixes) and entry_path not in keep:
+                del self.entries[entry_path]
+
+    def save(self) -> None:
+        if self.dry:
+            return
+        if (encoded := self.dumps_json(self.entries, option=None)) is None:
+            return
+        temp_path = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            _ = temp_path.write_text(encoded, encoding="utf-8")
+            _ = temp_path.replace(self.path)
+        except OSError as error:
+            self.warn(f"{self.path} : unable to write tags cache : {error}")
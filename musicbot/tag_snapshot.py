@@ -0,0 +1,176 @@
+import logging
+from dataclasses import dataclass
+from enum import Enum, unique
+from pathlib import Path, PurePath
+
+from beartype import beartype
+from beartype.typing import Any, Self
+
+from musicbot.folder import Folder
+from musicbot.helpers import current_user
+from musicbot.music import Music, MusicInput
+from musicbot.object import MusicbotObject
+
+logger = logging.getLogger(__name__)
+
+
+@unique
+class Issue(str, Enum):
+    NO_TITLE = "no-title"
+    NO_GENRE = "no-genre"
+    NO_ALBUM = "no-album"
+    NO_ARTIST = "no-artist"
+    NO_RATING = "no-rating"
+    NO_TRACK = "no-track"
+    INVALID_COMMENT = "invalid-comment"
+    INVALID_TITLE = "invalid-title"
+    INVALID_PATH = "invalid-path"
+
+
+@beartype
+@dataclass(frozen=True, slots=True)
+class TagSnapshot(MusicbotObject):
+    """Tags extracted once from a music file, detached from its Mutagen handle"""
+
+    folder: Path
+    path: Path
+    title: str
+    album: str
+    artist: str
+    genre: str
+    rating: float
+    length: int
+    size: int
+    keywords: frozenset[str]
+    track: int | None = None
+    mtime: int | None = None
+    comment: str = ""
+    description: str = ""
+
+    @classmethod
+    def from_dict(cls, folder: Path, path: Path, data: dict[str, Any]) -> Self:
+        return cls(
+            folder=folder,
+            path=path,
+            title=data["title"],
+            album=data["album"],
+            artist=data["artist"],
+            genre=data["genre"],
+            rating=float(data["rating"]),
+            length=data["length"],
+            size=data["size"],
+            keywords=frozenset(data["keywords"]),
+            track=data["track"],
+            mtime=data.get("mtime"),
+            comment=data.get("comment", ""),
+            description=data.get("description", ""),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "title": self.title,
+            "album": self.album,
+            "artist": self.artist,
+            "genre": self.genre,
+            "rating": self.rating,
+            "length": self.length,
+            "size": self.size,
+            "keywords": sorted(self.keywords),
+            "track": self.track,
+            "mtime": self.mtime,
+            "comment": self.comment,
+            "description": self.description,
+        }
+
+    def __repr__(self) -> str:
+        return str(self.path)
+
+    @property
+    def extension(self) -> str:
+        return self.path.suffix
+
+    @property
+    def canonic_title(self) -> str:
+        prefix = f"{str(self.track).zfill(2)} - "
+        if not self.title.startswith(prefix):
+            return f"{prefix}{self.title}"
+        return self.title
+
+    @property
+    def canonic_filename(self) -> str:
+        return f"{self.canonic_title}{self.extension}"
+
+    @property
+    def canonic_artist_album_filename(self) -> PurePath:
+        return PurePath(self.artist, self.album, self.canonic_filename)
+
+    @property
+    def issues(self) -> set[Issue]:
+        issues = set()
+        if not self.title:
+            issues.add(Issue.NO_TITLE)
+        if not self.genre:
+            issues.add(Issue.NO_GENRE)
+        if not self.album:
+            issues.add(Issue.NO_ALBUM)
+        if not self.artist:
+            issues.add(Issue.NO_ARTIST)
+        if self.rating == -1:
+            issues.add(Issue.NO_RATING)
+        if self.track == -1:
+            issues.add(Issue.NO_TRACK)
+        if self.extension == ".flac" and self.comment and not self.description:
+            issues.add(Issue.INVALID_COMMENT)
+        if self.extension == ".mp3" and self.description and not self.comment:
+            issues.add(Issue.INVALID_COMMENT)
+        if self.track not in (-1, 0) and self.title != self.canonic_title:
+            logger.debug(f"{self} : invalid title, '{self.title}' should be '{self.canonic_title}'")
+            issues.add(Issue.INVALID_TITLE)
+        if self.track not in (-1, 0) and not str(self.path).endswith(str(self.canonic_artist_album_filename)):
+            logger.debug(f"{self} : invalid path, must have a track and should end with '{self.canonic_artist_album_filename}'")
+            issues.add(Issue.INVALID_PATH)
+        return issues
+
+    @property
+    def music(self) -> Music | None:
+        if (public_ip := self.public_ip()) is None:
+            return None
+        folder = Folder(
+            name=str(self.folder),
+            path=self.path,
+            username=current_user(),
+            ipv4=public_ip,
+        )
+        return Music(
+            title=self.title,
+            size=self.size,
+            album=self.album,
+            artist=self.artist,
+            genre=self.genre,
+            length=self.length,
+            track=self.track,
+            rating=self.rating,
+            keywords=self.keywords,
+            folders=frozenset({folder}),
+        )
+
+    @property
+    def music_input(self) -> MusicInput | None:
+        if (public_ip := self.public_ip()) is None:
+            return None
+        return MusicInput(
+            title=self.title,
+            size=self.size,
+            album=self.album,
+            artist=self.artist,
+            genre=self.genre,
+            length=self.length,
+            track=self.track,
+            rating=self.rating,
+            keywords=list(self.keywords),
+            ipv4=public_ip,
+            username=current_user(),
+            folder=str(self.folder),
+            path=str(self.path),
+            mtime=self.mtime,
+        )
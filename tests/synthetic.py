@@ -0,0 +1,63 @@
+import shutil
+import struct
+from pathlib import Path
+
+from beartype import beartype
+from mutagen import id3
+from mutagen.flac import FLAC, Picture
+
+from . import fixtures
+
+flac_template = fixtures.folder_flac / "Buckethead" / "1994 - Giant Robot" / "01 - Doomride.flac"
+
+# MPEG1 Layer III, 128kbps, 44.1kHz, stereo, 1152 samples per frame
+MPEG_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+MPEG_FRAME_SIZE = 417
+COVER = b"\xff\xd8\xff\xe0" + bytes(32 * 1024)
+
+
+@beartype
+def mpeg_frames(frames: int) -> bytes:
+    """Silent CBR stream starting with a Xing "Info" frame, enough for Mutagen to compute a length"""
+    first = bytearray(MPEG_FRAME_SIZE)
+    first[:4] = MPEG_HEADER
+    xing = b"Info" + struct.pack(">III", 0x3, frames, MPEG_FRAME_SIZE * (frames + 1))
+    first[36 : 36 + len(xing)] = xing
+    return bytes(first) + (MPEG_HEADER + bytes(MPEG_FRAME_SIZE - 4)) * frames
+
+
+@beartype
+def write_mp3(path: Path, artist: str, album: str, title: str, track: int, genre: str, rating: float, keywords: list[str], cover: bool) -> None:
+    _ = path.write_bytes(mpeg_frames(frames=38 * (track + 1)))
+    tags = id3.ID3()
+    tags.add(id3.TIT2(encoding=id3.Encoding.UTF8, text=title))
+    tags.add(id3.TALB(encoding=id3.Encoding.UTF8, text=album))
+    tags.add(id3.TPE1(encoding=id3.Encoding.UTF8, text=artist))
+    tags.add(id3.TCON(encoding=id3.Encoding.UTF8, text=genre))
+    tags.add(id3.TRCK(encoding=id3.Encoding.UTF8, text=str(track)))
+    tags.add(id3.TXXX(encoding=id3.Encoding.UTF8, desc="FMPS_Rating", text=str(rating)))
+    tags.add(id3.COMM(encoding=id3.Encoding.UTF8, desc="", lang="XXX", text=" ".join(keywords)))
+    if cover:
+        tags.add(id3.APIC(encoding=id3.Encoding.UTF8, mime="image/jpeg", type=id3.PictureType.COVER_FRONT, desc="cover", data=COVER))
+    tags.save(path)
+
+
+@beartype
+def write_flac(path: Path, artist: str, album: str, title: str, track: int, genre: str, rating: float, keywords: list[str], cover: bool) -> None:
+    _ = shutil.copyfile(flac_template, path)
+    handle = FLAC(path)
+    handle.clear()
+    handle["title"] = title
+    handle["album"] = album
+    handle["artist"] = artist
+    handle["genre"] = genre
+    handle["tracknumber"] = str(track)
+    handle["fmps_rating"] = str(rating)
+    handle["description"] = " ".join(keywords)
+    if cover:
+        picture = Picture()
+        picture.type = id3.PictureType.COVER_FRONT
+        picture.mime = "image/jpeg"
+        picture.data = COVER
+        handle.add_picture(picture)
+    handle.save()
@@ -1,10 +1,15 @@
 import logging
+from pathlib import Path
 
 from beartype import beartype
+from mutagen import File as MutagenFile
 
-from musicbot.file import File
+from musicbot.fast_tags import read_tags
+from musicbot.file import File, mutagen_tags
+from musicbot.tag_cache import TagCache
 
 from . import fixtures
+from .synthetic import write_mp3
 
 logger = logging.getLogger(__name__)
 
@@ -37,3 +42,53 @@ def test_mp3_tags() -> None:
     assert m.keywords == {"rap", "french"}
     assert m.rating == 4.5
     assert m.length == 258
+
+
+@beartype
+def test_tag_cache(tmp_path: Path) -> None:
+    m = File.from_path(folder=fixtures.folder_flac, path=fixtures.one_flac)
+    assert m
+    stat = m.path.stat()
+    cache_path = tmp_path / "tags_cache"
+
+    tag_cache = TagCache.load(cache_path)
+    assert tag_cache.get(folder=m.folder, path=m.path, stat=stat) is None
+    tag_cache.add(snapshot=m.snapshot, stat=stat)
+    tag_cache.save()
+
+    tag_cache = TagCache.load(cache_path)
+    assert tag_cache.get(folder=m.folder, path=m.path, stat=stat) == m.snapshot
+    assert tag_cache.hits == 1
+    assert tag_cache.misses == 0
+
+
+@beartype
+def test_fast_tags() -> None:
+    for path in fixtures.folder_flac.rglob("*.flac"):
+        fast = read_tags(path)
+        assert fast is not None
+        tags, length = fast
+        handle = MutagenFile(path)
+        assert {tag: values for tag, values in tags.items() if tag in mutagen_tags(handle, flac=True)} == mutagen_tags(handle, flac=True)
+        assert length == handle.info.length
+
+
+@beartype
+def test_fast_tags_mp3(tmp_path: Path) -> None:
+    path = tmp_path / "01 - Doomride.mp3"
+    write_mp3(path=path, artist="Buckethead", album="Giant Robot", title="Doomride", track=1, genre="Avantgarde", rating=4.5, keywords=["rock", "cutoff"], cover=True)
+    fast = read_tags(path)
+    assert fast is not None
+    tags, length = fast
+    handle = MutagenFile(path)
+    assert {tag: values for tag, values in tags.items() if tag in mutagen_tags(handle, flac=False)} == mutagen_tags(handle, flac=False)
+    assert length == handle.info.length
+
+    data = path.read_bytes()
+    for size in range(3, 10):
+        truncated = tmp_path / f"truncated_{size}.mp3"
+        _ = truncated.write_bytes(data[:size])
+        assert read_tags(truncated) is None
+    garbage = tmp_path / "garbage.mp3"
+    _ = garbage.write_bytes(b"ID3" + bytes(range(256)))
+    assert read_tags(garbage) is None
@@ -1,11 +1,18 @@
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+
 from beartype import beartype
 from click.testing import CliRunner
 from click_skeleton.testing import run_cli
 
+from musicbot import File, MusicDb, ScanFolders, syncify
 from musicbot.main import cli
 from musicbot.object import MusicbotObject
 
 from . import fixtures
+from .synthetic import write_mp3
 
 
 @beartype
@@ -58,6 +65,47 @@ def test_local_clean(cli_runner: CliRunner, dsn: str) -> None:
     )
 
 
+@syncify
+@beartype
+async def stored_artist(dsn: str, name: str) -> tuple[int, int]:
+    """Stored musics count and length of an artist, 0 when it does not exist"""
+    musicdb = MusicDb.from_dsn(dsn)
+    artists = {artist.name: (artist.n_musics, artist.length) for artist in await musicdb.artists()}
+    return artists.get(name, (0, 0))
+
+
+@beartype
+def test_local_refresh_stats(cli_runner: CliRunner, dsn: str, tmp_path: Path) -> None:
+    album = tmp_path / "Refresh Stats" / "Stored"
+    album.mkdir(parents=True)
+    paths = [album / f"0{track} - Stored {track}.mp3" for track in (1, 2)]
+    for track, path in enumerate(paths, start=1):
+        write_mp3(path=path, artist="Refresh Stats", album="Stored", title=f"Stored {track}", track=track, genre="Rock", rating=4.0, keywords=[], cover=False)
+    lengths = [file.length for path in paths if (file := File.from_path(folder=tmp_path, path=path)) is not None]
+    assert len(lengths) == 2
+
+    _ = run_cli(cli_runner, cli, ["--quiet", "local", "scan", "--dsn", dsn, str(tmp_path)])
+    _ = run_cli(
+        cli_runner,
+        cli,
+        [
+            "--quiet",
+            "local",
+            "refresh-stats",
+            "--dsn",
+            dsn,
+        ],
+    )
+    assert stored_artist(dsn, "Refresh Stats") == (2, sum(lengths))
+
+    # removals refresh stored stats
+    _ = run_cli(cli_runner, cli, ["--quiet", "local", "remove", "--dsn", dsn, str(paths[0])])
+    assert stored_artist(dsn, "Refresh Stats") == (1, lengths[1])
+
+    _ = run_cli(cli_runner, cli, ["--quiet", "local", "remove", "--dsn", dsn, f"{tmp_path}{os.sep}"])
+    assert stored_artist(dsn, "Refresh Stats") == (0, 0)
+
+
 @beartype
 def test_local_watch(cli_runner: CliRunner, dsn: str) -> None:
     _ = run_cli(
@@ -148,8 +196,20 @@ def test_local_bests(cli_runner: CliRunner, dsn: str) -> None:
     )
 
 
+@syncify
 @beartype
-def test_local_scan(cli_runner: CliRunner, dsn: str) -> None:
+async def rescan(dsn: str, directory: Path, clean: bool = False) -> tuple[Counter[str], set[str]]:
+    """Incremental scan of a directory, returns its statistics and the paths stored after it"""
+    musicdb = MusicDb.from_dsn(dsn)
+    _ = await ScanFolders([directory]).scan(musicdb=musicdb, incremental=True)
+    paths = set(await musicdb.known_paths([str(directory.resolve())]))
+    if clean:
+        _ = await musicdb.remove_folder(str(directory.resolve()))
+    return musicdb.stats.counters, paths
+
+
+@beartype
+def test_local_scan(cli_runner: CliRunner, dsn: str, tmp_path: Path) -> None:
     _ = run_cli(
         cli_runner,
         cli,
@@ -163,6 +223,37 @@ def test_local_scan(cli_runner: CliRunner, dsn: str) -> None:
         ],
     )
 
+    _ = run_cli(
+        cli_runner,
+        cli,
+        [
+            "--quiet",
+            "local",
+            "scan",
+            "--incremental",
+            "--dsn",
+            dsn,
+            *fixtures.scan_folders,
+        ],
+    )
+
+    # a library reached through a symlink, with one modified and one vanished file
+    library = tmp_path / "library"
+    _ = shutil.copytree(fixtures.folder_flac, library)
+    link = tmp_path / "link"
+    link.symlink_to(library, target_is_directory=True)
+    _ = run_cli(cli_runner, cli, ["--quiet", "local", "scan", "--dsn", dsn, str(link)])
+    musics = sorted(library.resolve().rglob("*.flac"))
+    assert len(musics) >= 3
+    modified, vanished = musics[0], musics[1]
+    os.utime(modified, ns=(modified.stat().st_atime_ns, modified.stat().st_mtime_ns + 1_000_000_000))
+    vanished.unlink()
+
+    counters, paths = rescan(dsn, link, clean=True)
+    assert counters["parsed"] == 1
+    assert counters["unchanged"] == len(musics) - 2
+    assert paths == {str(music) for music in musics if music != vanished}
+
 
 @beartype
 def test_custom_playlists(cli_runner: CliRunner, dsn: str) -> None:
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import replace
+
+import gel
+from beartype import beartype
+from pytest import raises
+
+from musicbot import MusicDb, MusicFilter, ScanFolders, syncify
+from musicbot.adaptive_limiter import AdaptiveLimiter
+from musicbot.filter_compiler import compile_bests, compile_filters, escape_like
+from musicbot.playlist import Bests
+
+from . import fixtures
+
+logger = logging.getLogger(__name__)
+
+
+@syncify
+@beartype
+async def test_upsert_musics(dsn: str) -> None:
+    musicdb = MusicDb.from_dsn(dsn)
+    scan_folders = ScanFolders([fixtures.folder_flac])
+    music_inputs = [music_input for snapshot in scan_folders.snapshots if (music_input := snapshot.music_input) is not None]
+    assert music_inputs
+
+    # duplicated inputs conflict inside a single statement, they must be deferred to another round-trip
+    musics = await musicdb.upsert_musics(music_inputs + music_inputs)
+    assert len(musics) == 2 * len(music_inputs)
+    assert {music.title for music in musics} == {music_input.title for music_input in music_inputs}
+
+    # an invalid rating only drops its own music, the chunk is bisected
+    invalid = replace(music_inputs[0], title="Invalid rating", path=f"{music_inputs[0].path}.invalid", rating=0.3)
+    musics = await musicdb.upsert_musics([invalid, *music_inputs])
+    assert {music.title for music in musics} == {music_input.title for music_input in music_inputs}
+    assert musicdb.stats.counters["bisections"]
+
+
+@syncify
+@beartype
+async def test_warm_upsert_cache(dsn: str) -> None:
+    musicdb = MusicDb.from_dsn(dsn)
+    await musicdb.warm_upsert_cache()
+    assert musicdb.upsert_cache.warmed
+    assert "Buckethead" in musicdb.upsert_cache.artists_and_albums
+    assert "Giant Robot" in musicdb.upsert_cache.artists_and_albums["Buckethead"].albums
+    assert "Avantgarde" in musicdb.upsert_cache.genres
+
+
+@syncify
+@beartype
+async def test_single_flight(dsn: str) -> None:
+    musicdb = MusicDb.from_dsn(dsn)
+    artist_id = uuid.uuid4()
+    calls = 0
+
+    async def upsert() -> uuid.UUID:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return artist_id
+
+    artist_ids = await asyncio.gather(*[musicdb.single_flight(("artist", "Buckethead"), upsert) for _ in range(10)])
+    assert set(artist_ids) == {artist_id}
+    assert calls == 1
+    assert musicdb.stats.counters["coalesced watch upserts"] == 9
+    assert not musicdb.inflight
+
+
+@syncify
+@beartype
+async def test_adaptive_limiter() -> None:
+    limiter = AdaptiveLimiter(max_limit=16)
+    assert limiter.limit == 4
+    running = 0
+    peak = 0
+
+    async def query() -> None:
+        nonlocal running, peak
+        async with limiter.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+
+    _ = await asyncio.gather(*[query() for _ in range(100)])
+    assert peak <= limiter.limit
+    assert limiter.limit > 4
+
+    limit = limiter.limit
+    try:
+        async with limiter.slot():
+            raise gel.errors.TransactionSerializationError("conflict")
+    except gel.errors.TransactionSerializationError:
+        pass
+    assert limiter.limit == limit // 2
+    assert limiter.decreases == 1
+    assert limiter.in_use == 0
+
+
+@syncify
+@beartype
+async def test_keywords_filters(dsn: str) -> None:
+    musicdb = MusicDb.from_dsn(dsn)
+
+    async def titles(music_filter: MusicFilter) -> set[str]:
+        playlist = await musicdb.make_playlist(frozenset([music_filter]))
+        return {music.title for music in playlist.musics}
+
+    assert await titles(MusicFilter(keywords_any=frozenset({"intro", "talkover"}))) == {"Doomride", "I Come In Peace"}
+    assert await titles(MusicFilter(keywords_all=frozenset({"experimental", "heavy"}))) == {"Doomride"}
+    assert not await titles(MusicFilter(keywords_all=frozenset({"experimental", "unknown"})))
+    assert "Doomride" not in await titles(MusicFilter(keywords_none=frozenset({"intro"})))
+
+
+@beartype
+def test_compile_filters() -> None:
+    query, arguments = compile_filters([MusicFilter()])
+    assert "filter" not in query
+    assert not arguments
+
+    query, arguments = compile_filters([MusicFilter(artist="^Buckethead$", title="Peace", genre="Rock|Metal", min_rating=4.0)])
+    assert ".artist.name = <str>$f0_artist" in query
+    assert ".name like <str>$f0_title" in query
+    assert query.index(".rating >=") < query.index("re_test(<str>$f0_genre")
+    assert arguments == {"f0_artist": "Buckethead", "f0_title": "%Peace%", "f0_genre": "Rock|Metal", "f0_min_rating": 4.0}
+
+    # same non-default fields, same cached query
+    other_query, _ = compile_filters([MusicFilter(artist="^Metallica$", title="Master", genre="Jazz|Soul", min_rating=4.5)])
+    assert other_query is query
+
+    # filters are unioned in one statement, each one with its own limit
+    query, arguments = compile_filters([MusicFilter(genre="^Rock$"), MusicFilter(artist="^Buckethead$", limit=5)])
+    assert query.count("select Music") == 2
+    assert "limit <`Limit`>$f0_limit" in query
+    assert arguments == {"f0_artist": "Buckethead", "f0_limit": 5, "f1_genre": "Rock"}
+
+
+@beartype
+def test_escape_like() -> None:
+    assert escape_like("/music/100%_rock/") == r"/music/100\%\_rock/"
+    # a trailing backslash must not escape the wildcard appended after it
+    assert escape_like("C:\\music\\") == "C:\\\\music\\\\"
+    assert escape_like(r"a\%b") == r"a\\\%b"
+
+
+@beartype
+def test_compile_bests() -> None:
+    query, arguments = compile_bests([MusicFilter(min_rating=4.0)])
+    # full musics are selected once, every group only carries ids
+    assert query.count("folders: {") == 1
+    assert query.count("ids :=") == 5
+    assert arguments == {"f0_min_rating": 4.0}
+
+
+@beartype
+def test_bests_document() -> None:
+    def music(music_id: str, title: str, rating: float) -> dict:
+        return {
+            "id": music_id,
+            "name": title,
+            "album": {"name": "album"},
+            "artist": {"name": "artist"},
+            "genre": {"name": "Rock"},
+            "size": 1,
+            "rating": rating,
+            "length": 1,
+            "keywords": [{"name": "cut"}],
+            "folders": [],
+            "track": 1,
+        }
+
+    data = {
+        "musics": [music("b", "second", 5.0), music("a", "first", 4.0)],
+        "genres": [{"name": "Rock", "ids": ["a", "b"]}],
+        "keywords": [{"name": "cut", "ids": ["a", "b"]}],
+        "ratings": [{"rating": 4.0, "ids": ["a"]}, {"rating": 5.0, "ids": ["b"]}],
+        "keywords_for_artist": [{"artist": "artist", "keywords": [{"name": "cut", "ids": ["b"]}]}],
+        "ratings_for_artist": [{"artist": "artist", "rating": 5.0, "ids": ["b"]}],
+    }
+    playlists = {playlist.name: [music.title for music in playlist.musics] for playlist in Bests.from_dict(data).playlists}
+    # groups keep the order of the musics in the query
+    assert playlists["genre_rock"] == ["second", "first"]
+    assert playlists["rating_4.0"] == ["first"]
+    assert playlists[f"artist{os.sep}keyword_cut"] == ["second"]
+    assert len(playlists) == 6
+
+    with raises(ValueError):
+        _ = Bests.from_dict({})
+    with raises(ValueError):
+        _ = Bests.from_dict({**data, "ratings": [{"rating": 1.0, "ids": ["missing"]}]})
+
+
+@syncify
+@beartype
+async def test_remove_folder(dsn: str) -> None:
+    musicdb = MusicDb.from_dsn(dsn)
+    scan_folders = ScanFolders([fixtures.folder_flac])
+    music_inputs = [music_input for snapshot in scan_folders.snapshots if (music_input := snapshot.music_input) is not None]
+
+    assert not await musicdb.remove_music_paths([str(fixtures.folder_flac / "missing.flac")])
+    assert await musicdb.remove_folder(str(fixtures.folder_flac))
+
+    # restore removed paths for other tests
+    _ = await musicdb.upsert_musics(music_inputs)
+
+
+@syncify
+@beartype
+async def test_iter_playlist(dsn: str) -> None:
+    musicdb = MusicDb.from_dsn(dsn)
+    playlist = await musicdb.make_playlist()
+    # a page of one music crosses every page boundary
+    musics = [music async for music in musicdb.iter_playlist(page_size=1)]
+    assert len(musics) == len(playlist.musics)
+    assert {music.title for music in musics} == {music.title for music in playlist.musics}
@@ -0,0 +1,106 @@
+import os
+import shutil
+from pathlib import Path
+
+from beartype import beartype
+from natsort import os_sorted
+
+from musicbot.local import BESTS_PLAYLISTS
+from musicbot.playlist_writers import default_mode, write_playlists
+from musicbot.scan_folders import ScanFolders, normalize_path
+from musicbot.scan_stats import ScanStats
+
+from . import fixtures
+
+
+@beartype
+def test_walk() -> None:
+    scan_folders = ScanFolders([fixtures.folder_flac])
+    expected = set()
+    for root, _, basenames in os.walk(fixtures.folder_flac):
+        for basename in basenames:
+            if basename.endswith(tuple(scan_folders.extensions)):
+                expected.add((fixtures.folder_flac, Path(root) / basename))
+    assert set(scan_folders.walk()) == expected
+    assert scan_folders.folders_and_paths == expected
+
+    # limited walks keep the first files in natural order, whatever the walk order
+    limited = ScanFolders([fixtures.folder_flac], limit=2)
+    assert list(limited.limited_walk()) == os_sorted(expected, key=lambda folder_and_path: folder_and_path[1])[:2]
+    assert limited.folders_and_paths == set(limited.limited_walk())
+
+
+@beartype
+def test_walk_except_directories(tmp_path: Path) -> None:
+    (tmp_path / "Android" / "music").mkdir(parents=True)
+    (tmp_path / "Android" / "music" / "skipped.mp3").touch()
+    (tmp_path / "artist").mkdir()
+    (tmp_path / "artist" / "kept.mp3").touch()
+    (tmp_path / "artist" / "cover.jpg").touch()
+    scan_folders = ScanFolders([tmp_path])
+    assert set(scan_folders.walk()) == {(tmp_path.resolve(), tmp_path.resolve() / "artist" / "kept.mp3")}
+
+
+@beartype
+def test_process_executor() -> None:
+    threaded = ScanFolders([fixtures.folder_flac])
+    processed = ScanFolders([fixtures.folder_flac], executor="process", chunksize=1)
+    assert processed.files
+    assert [file.snapshot for file in processed.files] == [file.snapshot for file in threaded.files]
+    assert processed.snapshots == threaded.snapshots
+
+
+@beartype
+def test_scan_stats() -> None:
+    stats = ScanStats()
+    with stats.timer("parse"):
+        stats.count("files", 2)
+    stats.cache("genres", hit=True)
+    stats.cache("genres", hit=False)
+    stats.latencies.extend(float(latency) for latency in range(1, 101))
+    data = stats.to_dict()
+    assert data["counters"] == {"files": 2, "genres cache hits": 1, "genres cache misses": 1}
+    assert data["timers"]["parse"] >= 0
+    assert data["upsert_latency"]["p50"] == 50.5
+    assert 95 <= data["upsert_latency"]["p95"] <= data["upsert_latency"]["p99"] <= 100
+
+
+@beartype
+def test_write_playlists(tmp_path: Path) -> None:
+    unchanged = tmp_path / "unchanged.m3u"
+    changed = tmp_path / "changed.m3u"
+    stale = tmp_path / "stale.m3u"
+    assert sorted(write_playlists({unchanged: "#EXTM3U\n", changed: "#EXTM3U\n", stale: "#EXTM3U\n"})) == [changed, stale, unchanged]
+    os.utime(unchanged, (0, 0))
+    assert write_playlists({unchanged: "#EXTM3U\n", changed: "#EXTM3U\n#EXTREM:changed\n"}) == [changed]
+    assert unchanged.stat().st_mtime == 0
+    assert changed.read_text(encoding="utf-8-sig") == "#EXTM3U\n#EXTREM:changed\n"
+    assert unchanged.stat().st_mode & 0o777 == default_mode()
+    changed.chmod(0o640)
+    assert write_playlists({changed: "#EXTM3U\n"}) == [changed]
+    assert changed.stat().st_mode & 0o777 == 0o640
+
+    artist = tmp_path / "artist"
+    pikes = artist / "Pikes"
+    pikes.mkdir(parents=True)
+    kept = artist / "rating_5.0.m3u"
+    for path in (kept, artist / "keyword_stale.m3u", artist / "custom.m3u", pikes / "rating_5.0.m3u"):
+        path.touch()
+    ScanFolders([tmp_path]).flush_m3u(keep=frozenset([unchanged, changed, kept]), patterns=BESTS_PLAYLISTS)
+    assert sorted(tmp_path.rglob("*.m3u")) == sorted([changed, unchanged, kept, artist / "custom.m3u", pikes / "rating_5.0.m3u"])
+    assert not list(tmp_path.rglob(".*"))
+
+
+@beartype
+def test_lookup_known_paths(tmp_path: Path) -> None:
+    library = tmp_path / "library"
+    _ = shutil.copytree(fixtures.folder_flac, library)
+    link = tmp_path / "link"
+    link.symlink_to(library, target_is_directory=True)
+    path = next(library.rglob("*.flac"))
+    stat = path.stat()
+    # paths stored through the symlink or its target are both known
+    for stored in (path, link / path.relative_to(library)):
+        known_paths: dict[str, tuple[int, int | None]] = {normalize_path(stored): (stat.st_size, stat.st_mtime_ns)}
+        assert ScanFolders([link]).lookup(folder=link, path=link / path.relative_to(library), known_paths=known_paths) is None
+        assert ScanFolders([library]).lookup(folder=library, path=path, known_paths=known_paths) is None